@@ -1,8 +1,13 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.auth import get_user_model
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, RecipeTag,
-                     ShoppingCart, Tag)
+from .models import (Favorite, FeedEntry, Ingredient, Recipe,
+                     RecipeIngredient, RecipeTag, ShoppingCart,
+                     ShoppingListItem, Tag)
+from .search import recipe_search
+from .signals import manual_recipe_sync
+
+User = get_user_model()
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -25,19 +30,30 @@ class TagInlineAdmin(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'favorited_count')
+    list_display = ('name', 'author', 'favorited_count', 'in_cart_count')
     search_fields = ('name', 'author', 'tags')
     inlines = [IngredientInlineAdmin, TagInlineAdmin]
 
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(favorited_count=Count('favorited'))
-
-    @staticmethod
-    def favorited_count(obj):
-        return Recipe.objects.annotate_favorited_count().get(
-            id=obj.id
-        ).favorited_count
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'author' in form.changed_data:
+            User.objects.filter(id=form.initial['author']).increment(
+                'recipes_count', -1
+            )
+            User.objects.filter(id=obj.author_id).increment('recipes_count')
+            FeedEntry.objects.filter(recipe_id=obj.id).delete()
+            FeedEntry.objects.fan_out(obj)
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = ShoppingListItem.objects.recipe_amounts(
+            [recipe.id]
+        )[recipe.id]
+        with manual_recipe_sync():
+            super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.recipe_changed(recipe, old_amounts)
+        Recipe.objects.filter(id=recipe.id).bump_version()
+        recipe_search.update([recipe.id])
 
 
 class RecipeIngredientAdmin(admin.ModelAdmin):
@@ -56,6 +72,10 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe',)
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+
+
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
@@ -63,3 +83,4 @@ admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(RecipeTag, RecipeTagAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
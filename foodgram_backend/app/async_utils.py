@@ -0,0 +1,67 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from users.authentication import CachedTokenAuthentication
+
+TOGGLE_METHODS = ('GET', 'DELETE')
+
+
+def authenticate(request):
+    result = CachedTokenAuthentication().authenticate(request)
+    if result is None:
+        raise NotAuthenticated
+    request.user = result[0]
+    return request.user
+
+
+def render(data=None, status_code=status.HTTP_200_OK):
+    if data is None:
+        return HttpResponse(status=status_code)
+    return HttpResponse(JSONRenderer().render(data), status=status_code,
+                        content_type='application/json')
+
+
+def run_in_thread(handler):
+    """Запускает обработчик в пуле потоков со своим соединением с БД.
+
+    В отличие от thread_sensitive=True, запросы не выстраиваются
+    в очередь к единственному потоку синхронного кода. Соединения
+    закрываются так же, как после обычного запроса.
+    """
+
+    def call(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            return handler(request, *args, **kwargs)
+        except APIException as error:
+            response = render({'detail': error.detail}, error.status_code)
+            if error.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = 'Token'
+            return response
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def toggle_view(handler):
+    """Асинхронное представление для добавления (GET) и удаления (DELETE).
+
+    Декораторы Django 3.2 не поддерживают корутины, поэтому метод
+    и csrf_exempt обрабатываются здесь.
+    """
+    call = run_in_thread(handler)
+
+    @wraps(handler)
+    async def view(request, pk):
+        if request.method not in TOGGLE_METHODS:
+            return HttpResponseNotAllowed(TOGGLE_METHODS)
+        return await call(request, pk)
+
+    view.csrf_exempt = True
+    return view
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from .async_utils import authenticate, render, toggle_view
+from .models import Favorite, Recipe, ShoppingCart
+from .serializers import RecipeCommonSerializer
+
+User = get_user_model()
+
+
+def toggle_recipe(request, pk, model, exists_error, missing_error):
+    user = authenticate(request)
+    recipe = Recipe.objects.only(
+        *RecipeCommonSerializer.Meta.fields
+    ).filter(id=pk).first()
+    if recipe is None:
+        raise NotFound
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            User.objects.filter(id=user.id).lock()
+            deleted, _ = model.objects.filter(
+                user=user, recipe=recipe
+            ).delete()
+        if not deleted:
+            return render({'errors': missing_error},
+                          status.HTTP_400_BAD_REQUEST)
+        return render(status_code=status.HTTP_204_NO_CONTENT)
+    with transaction.atomic():
+        User.objects.filter(id=user.id).lock()
+        _, created = model.objects.get_or_create(user=user, recipe=recipe)
+    if not created:
+        return render({'error': [exists_error]}, status.HTTP_400_BAD_REQUEST)
+    return render(
+        RecipeCommonSerializer(recipe, context={'request': request}).data,
+        status.HTTP_201_CREATED
+    )
+
+
+@toggle_view
+def favorite(request, pk):
+    return toggle_recipe(request, pk, Favorite,
+                         'Вы уже добавили рецепт в избранное!',
+                         'Рецепт уже удален из избранного!')
+
+
+@toggle_view
+def shopping_cart(request, pk):
+    return toggle_recipe(request, pk, ShoppingCart,
+                         'Вы уже добавили рецепт в список покупок!',
+                         'Рецепт уже удален из корзины!')
@@ -0,0 +1,136 @@
+import heapq
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from .cache import ingredients_cache
+
+NGRAM_SIZE = 3
+FUZZY_THRESHOLD = 0.4
+# Одна опечатка в коротком слове меняет большую часть его триграмм:
+# у 'сахр' и 'сахар' сходство 2/7, поэтому для коротких запросов порог ниже.
+SHORT_QUERY_LENGTH = 5
+SHORT_FUZZY_THRESHOLD = 0.25
+EXACT, PREFIX, SUBSTRING, FUZZY = range(4)
+
+
+def make_ngrams(text, padded=True):
+    if padded:
+        text = f' {text} '
+    return {
+        text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)
+    }
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса для автодополнения.
+
+    Названия приводятся к casefold и хранятся отсортированными, поэтому
+    поиск по префиксу сводится к двум bisect. Для поиска по подстроке и
+    с опечатками строится индекс триграмм. Индекс собирается лениво и
+    пересобирается, когда меняется версия справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def invalidate(self):
+        self._data = None
+
+    def get_data(self):
+        version = ingredients_cache.get_version()
+        data = self._data
+        if data is None or self._version != version:
+            with self._lock:
+                if self._data is None or self._version != version:
+                    self._data = self.build()
+                    self._version = version
+                data = self._data
+        return data
+
+    @staticmethod
+    def build():
+        from .models import Ingredient
+        entries = sorted(
+            (name.casefold(), id, name, measurement_unit)
+            for id, name, measurement_unit in Ingredient.objects.order_by(
+            ).values_list('id', 'name', 'measurement_unit')
+        )
+        keys = [entry[0] for entry in entries]
+        ngrams = defaultdict(list)
+        for position, key in enumerate(keys):
+            for ngram in make_ngrams(key):
+                ngrams[ngram].append(position)
+        return keys, entries, dict(ngrams)
+
+    def search(self, query, limit=None, fuzzy=False):
+        keys, entries, ngrams = self.get_data()
+        query = query.strip().casefold()
+        if not query:
+            best = range(len(entries))[:limit]
+        else:
+            ranks = self.rank(query, keys, ngrams, fuzzy)
+            if limit is None:
+                best = sorted(ranks, key=ranks.get)
+            else:
+                best = heapq.nsmallest(limit, ranks, key=ranks.get)
+        return [
+            {
+                'id': entries[position][1],
+                'name': entries[position][2],
+                'measurement_unit': entries[position][3],
+            } for position in best
+        ]
+
+    def rank(self, query, keys, ngrams, fuzzy):
+        ranks = {}
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '\U0010ffff', start)
+        for position in range(start, end):
+            key = keys[position]
+            tier = EXACT if key == query else PREFIX
+            ranks[position] = (tier, 0, len(key), key)
+        if not fuzzy:
+            return ranks
+        for position in self.substring_candidates(query, keys, ngrams):
+            key = keys[position]
+            if position not in ranks and query in key:
+                ranks[position] = (SUBSTRING, 0, len(key), key)
+        query_ngrams = make_ngrams(query)
+        threshold = (
+            SHORT_FUZZY_THRESHOLD if len(query) <= SHORT_QUERY_LENGTH
+            else FUZZY_THRESHOLD
+        )
+        shared = Counter(
+            position
+            for ngram in query_ngrams
+            for position in ngrams.get(ngram, ())
+        )
+        for position, count in shared.items():
+            if position in ranks:
+                continue
+            key = keys[position]
+            similarity = count / (
+                len(query_ngrams) + len(make_ngrams(key)) - count
+            )
+            if similarity >= threshold:
+                ranks[position] = (FUZZY, -similarity, len(key), key)
+        return ranks
+
+    @staticmethod
+    def substring_candidates(query, keys, ngrams):
+        query_ngrams = make_ngrams(query, padded=False)
+        if not query_ngrams:
+            return range(len(keys))
+        postings = sorted(
+            (ngrams.get(ngram, []) for ngram in query_ngrams), key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+        return candidates
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+
+User = get_user_model()
+
+
+class BatchSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                default=list,
+                                max_length=settings.BATCH_MAX_SIZE)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        default=list,
+        max_length=settings.BATCH_MAX_SIZE
+    )
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError(
+                'Передайте id для добавления или удаления!'
+            )
+        return {key: list(dict.fromkeys(ids)) for key, ids in data.items()}
+
+
+class RelationBatch:
+    """Добавление и удаление связей пользователя пачкой.
+
+    Все изменения выполняются в одной транзакции одним INSERT и одним
+    DELETE. Сигналы при этом не отправляются, поэтому счетчики и список
+    покупок обновляются в ``added`` и ``removed``. Текущие связи читаются
+    под блокировкой строки пользователя, которую берут и одиночные
+    переключатели, поэтому ``added`` и ``removed`` получают только
+    действительно измененные связи. Ошибка по одному id не отменяет
+    остальные изменения.
+    """
+
+    model = None
+    field = None
+    target_model = Recipe
+    not_found_error = 'Рецепт не найден!'
+    conflict_error = 'id указан и для добавления, и для удаления!'
+    exists_error = None
+    missing_error = None
+
+    def apply(self, user, add_ids, remove_ids):
+        with transaction.atomic():
+            User.objects.filter(id=user.id).lock()
+            errors = self.get_errors(user, add_ids, remove_ids)
+            added = [target_id for target_id in add_ids
+                     if ('add', target_id) not in errors]
+            removed = [target_id for target_id in remove_ids
+                       if ('remove', target_id) not in errors]
+            self.model.objects.bulk_create([
+                self.model(user=user, **{f'{self.field}_id': target_id})
+                for target_id in added
+            ], ignore_conflicts=True)
+            self.delete_rows(user, removed)
+            self.added(user, added)
+            self.removed(user, removed)
+        return [
+            self.get_result(action, target_id, errors)
+            for action, ids in (('add', add_ids), ('remove', remove_ids))
+            for target_id in ids
+        ]
+
+    def delete_rows(self, user, target_ids):
+        """Удаляет связи без сигналов: их работу выполняет removed()."""
+        if not target_ids:
+            return
+        quote = connection.ops.quote_name
+        meta = self.model._meta
+        placeholders = ', '.join(['%s'] * len(target_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(meta.db_table)} '
+                f'WHERE {quote(meta.get_field("user").column)} = %s '
+                f'AND {quote(meta.get_field(self.field).column)} '
+                f'IN ({placeholders})',
+                [user.id, *target_ids]
+            )
+
+    def get_errors(self, user, add_ids, remove_ids):
+        requested = {*add_ids, *remove_ids}
+        found = set(self.target_model.objects.filter(
+            id__in=requested
+        ).values_list('id', flat=True))
+        current = set(self.model.objects.filter(
+            user=user, **{f'{self.field}_id__in': requested}
+        ).values_list(f'{self.field}_id', flat=True))
+        conflicts = set(add_ids) & set(remove_ids)
+        errors = {}
+        for action, ids in (('add', add_ids), ('remove', remove_ids)):
+            for target_id in ids:
+                if target_id in conflicts:
+                    error = self.conflict_error
+                else:
+                    error = self.get_error(user, action, target_id,
+                                           found, current)
+                if error:
+                    errors[action, target_id] = error
+        return errors
+
+    def get_error(self, user, action, target_id, found, current):
+        if target_id not in found:
+            return self.not_found_error
+        if action == 'remove':
+            return None if target_id in current else self.missing_error
+        if target_id in current:
+            return self.exists_error
+        return None
+
+    @staticmethod
+    def get_result(action, target_id, errors):
+        result = {'id': target_id, 'action': action,
+                  'success': (action, target_id) not in errors}
+        if not result['success']:
+            result['error'] = errors[action, target_id]
+        return result
+
+    def added(self, user, target_ids):
+        pass
+
+    def removed(self, user, target_ids):
+        pass
+
+
+class RecipeCounterBatch(RelationBatch):
+    field = 'recipe'
+    counter = None
+
+    def added(self, user, recipe_ids):
+        Recipe.objects.filter(id__in=recipe_ids).increment(self.counter)
+
+    def removed(self, user, recipe_ids):
+        Recipe.objects.filter(id__in=recipe_ids).increment(self.counter, -1)
+
+
+class FavoriteBatch(RecipeCounterBatch):
+    model = Favorite
+    counter = 'favorited_count'
+    exists_error = 'Вы уже добавили рецепт в избранное!'
+    missing_error = 'Рецепт уже удален из избранного!'
+
+
+class ShoppingCartBatch(RecipeCounterBatch):
+    model = ShoppingCart
+    counter = 'in_cart_count'
+    exists_error = 'Вы уже добавили рецепт в список покупок!'
+    missing_error = 'Рецепт уже удален из корзины!'
+
+    def added(self, user, recipe_ids):
+        super().added(user, recipe_ids)
+        ShoppingListItem.objects.add_recipes(user.id, recipe_ids)
+
+    def removed(self, user, recipe_ids):
+        super().removed(user, recipe_ids)
+        ShoppingListItem.objects.remove_recipes(user.id, recipe_ids)
+
+
+def batch_response(request, batch):
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(batch.apply(request.user,
+                                serializer.validated_data['add'],
+                                serializer.validated_data['remove']))
+
+
+favorite_batch = FavoriteBatch()
+shopping_cart_batch = ShoppingCartBatch()
@@ -0,0 +1,125 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+
+class ReferenceCache:
+    """Готовые JSON-ответы справочника в памяти процесса.
+
+    Номер версии хранится в кэше Django, поэтому при общем бэкенде
+    кэша изменение справочника в одном процессе сбрасывает ответы во
+    всех остальных.
+    """
+
+    def __init__(self, name, max_entries=1000):
+        self.name = name
+        self.max_entries = max_entries
+        self.version_key = f'reference_version:{name}'
+        self._lock = threading.Lock()
+        self._version = None
+        self._responses = {}
+
+    @staticmethod
+    def initial_version():
+        return time.time_ns()
+
+    def get_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, self.initial_version(), None)
+            version = cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, self.initial_version(), None)
+
+    def get(self, version, key):
+        if version != self._version:
+            return None
+        return self._responses.get(key)
+
+    def set(self, version, key, content):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._responses = {}
+            if len(self._responses) < self.max_entries:
+                self._responses[key] = content
+
+
+class TagSlugMap:
+    """Соответствие слагов тегов их id в памяти процесса.
+
+    Пересобирается одним запросом, когда меняется версия справочника
+    тегов, поэтому фильтр по тегам не проверяет слаги отдельным
+    запросом. Незнакомые слаги ищутся в БД одним запросом: тег мог
+    появиться раньше, чем новая версия справочника дошла до процесса.
+    """
+
+    def __init__(self, reference_cache):
+        self.reference_cache = reference_cache
+        self._lock = threading.Lock()
+        self._version = None
+        self._ids = {}
+
+    def get_ids(self, slugs=()):
+        from .models import Tag
+        version = self.reference_cache.get_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._ids = dict(Tag.objects.values_list('slug', 'id'))
+                    self._version = version
+        missing = [slug for slug in slugs if slug not in self._ids]
+        if missing:
+            found = dict(Tag.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+            if found:
+                with self._lock:
+                    self._ids = {**self._ids, **found}
+        return self._ids
+
+
+class CachedReferenceMixin:
+    reference_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, render, request, *args, **kwargs):
+        if request.query_params:
+            return render(request, *args, **kwargs)
+        version = self.reference_cache.get_version()
+        etag = f'"{self.reference_cache.name}-{version}"'
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            content = self.reference_cache.get(version, request.path)
+            if content is None:
+                response = render(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                content = JSONRenderer().render(response.data)
+                self.reference_cache.set(version, request.path, content)
+            response = HttpResponse(content,
+                                    content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+ingredients_cache = ReferenceCache('ingredients')
+tags_cache = ReferenceCache('tags')
+tag_slugs = TagSlugMap(tags_cache)
@@ -1,7 +1,29 @@
+from django.db.models import Exists, OuterRef
 from django_filters import filters as base_filters
 from django_filters import rest_framework as filters
+from django_filters.fields import MultipleChoiceField
+from django_filters.widgets import BooleanWidget
+from rest_framework.filters import SearchFilter
 
-from .models import Ingredient, Recipe, Tag
+from .cache import tag_slugs
+from .models import Ingredient, Recipe, RecipeTag
+from .search import recipe_search
+from .viewer import get_viewer_context
+
+
+def tag_slug_choices():
+    return [(slug, slug) for slug in tag_slugs.get_ids()]
+
+
+class TagSlugField(MultipleChoiceField):
+    def validate(self, value):
+        # Подтягивает в карту слаги, которых в ней еще нет.
+        tag_slugs.get_ids(value)
+        super().validate(value)
+
+
+class TagSlugFilter(base_filters.MultipleChoiceFilter):
+    field_class = TagSlugField
 
 
 class IngredientFilter(filters.FilterSet):
@@ -13,14 +35,61 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = base_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = TagSlugFilter(choices=tag_slug_choices, method='filter_tags')
+    tags_match = base_filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='skip',
+    )
+    is_favorited = base_filters.BooleanFilter(
+        method='filter_is_favorited', widget=BooleanWidget()
+    )
+    is_in_shopping_cart = base_filters.BooleanFilter(
+        method='filter_is_in_shopping_cart', widget=BooleanWidget()
+    )
+    ordering = base_filters.OrderingFilter(
+        fields=('pub_date', 'favorited_count', 'in_cart_count')
     )
-    is_favorited = base_filters.BooleanFilter()
-    is_in_shopping_cart = base_filters.BooleanFilter()
 
     class Meta:
         model = Recipe
         fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+
+    @staticmethod
+    def skip(queryset, name, value):
+        return queryset
+
+    def filter_tags(self, queryset, name, value):
+        slug_ids = tag_slugs.get_ids()
+        tag_ids = {slug_ids[slug] for slug in value if slug in slug_ids}
+        if self.form.cleaned_data.get('tags_match') != 'all':
+            return queryset.filter(id__in=RecipeTag.objects.filter(
+                tag_id__in=tag_ids
+            ).values('recipe_id'))
+        for tag_id in tag_ids:
+            queryset = queryset.filter(Exists(RecipeTag.objects.filter(
+                recipe_id=OuterRef('pk'), tag_id=tag_id
+            )))
+        return queryset
+
+    @staticmethod
+    def filter_by_ids(queryset, ids, value):
+        if value:
+            return queryset.filter(id__in=ids)
+        return queryset.exclude(id__in=ids)
+
+    def filter_is_favorited(self, queryset, name, value):
+        viewer = get_viewer_context(self.request)
+        return self.filter_by_ids(queryset, viewer.favorited_ids, value)
+
+    def filter_is_in_shopping_cart(self, queryset, name, value):
+        viewer = get_viewer_context(self.request)
+        return self.filter_by_ids(queryset, viewer.cart_ids, value)
+
+
+class RecipeSearchFilter(SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        return recipe_search.filter(
+            queryset,
+            request.query_params.get(self.search_param, ''),
+            rank='ordering' not in request.query_params,
+        )
@@ -0,0 +1,114 @@
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .storage import content_hash_storage
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipe_pic/variants'
+
+_executors = {}
+
+
+def get_executor(kind):
+    if kind not in _executors:
+        executor_class = {
+            'process': ProcessPoolExecutor,
+            'thread': ThreadPoolExecutor,
+        }[kind]
+        _executors[kind] = executor_class(
+            max_workers=settings.RECIPE_IMAGE_WORKERS
+        )
+    return _executors[kind]
+
+
+def render_variants(data, widths, image_format, quality):
+    with Image.open(io.BytesIO(data)) as image:
+        largest = max(widths.values())
+        image.draft('RGB', (largest, largest * image.height // image.width))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert(
+                'RGBA' if 'transparency' in image.info else 'RGB'
+            )
+        variants = {}
+        for name, width in widths.items():
+            variant = image
+            if image.width > width:
+                variant = image.resize(
+                    (width, round(image.height * width / image.width)),
+                    Image.LANCZOS
+                )
+            buffer = io.BytesIO()
+            variant.save(buffer, image_format, quality=quality)
+            variants[name] = buffer.getvalue()
+    return variants
+
+
+def build_variants(recipe_id, source):
+    from .models import Recipe
+    with content_hash_storage.open(source) as file:
+        data = file.read()
+    rendered = get_executor('process').submit(
+        render_variants,
+        data,
+        settings.RECIPE_IMAGE_VARIANTS,
+        settings.RECIPE_IMAGE_FORMAT,
+        settings.RECIPE_IMAGE_QUALITY,
+    ).result()
+    extension = settings.RECIPE_IMAGE_FORMAT.lower()
+    variants = {'source': source}
+    for name, content in rendered.items():
+        variants[name] = content_hash_storage.save(
+            f'{VARIANTS_DIR}/{name}.{extension}', ContentFile(content)
+        )
+    Recipe.objects.filter(id=recipe_id, image=source).update(
+        image_variants=variants, version=F('version') + 1
+    )
+    return variants
+
+
+def build_variants_in_background(recipe_id, source):
+    try:
+        return build_variants(recipe_id, source)
+    except Exception:
+        logger.exception('Не удалось подготовить картинки рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe):
+    if not recipe.image:
+        return
+    source = recipe.image.name
+    if recipe.image_variants.get('source') == source:
+        return
+    transaction.on_commit(lambda: get_executor('thread').submit(
+        build_variants_in_background, recipe.id, source
+    ))
+
+
+def variant_urls(recipe, request=None):
+    return build_variant_urls(recipe.image.name, recipe.image_variants,
+                              request)
+
+
+def build_variant_urls(source, variants, request=None):
+    if not source:
+        return None
+    variants = variants or {}
+    if variants.get('source') != source:
+        variants = {}
+    urls = {}
+    for name in settings.RECIPE_IMAGE_VARIANTS:
+        url = content_hash_storage.url(variants.get(name, source))
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
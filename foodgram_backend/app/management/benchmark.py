@@ -0,0 +1,78 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+@contextmanager
+def view_attribute(views, name, value):
+    """Временно меняет атрибут класса у представлений."""
+    previous = {view: getattr(view, name) for view in views}
+    for view in views:
+        setattr(view, name, value)
+    try:
+        yield
+    finally:
+        for view, old in previous.items():
+            setattr(view, name, old)
+
+
+class Rollback(Exception):
+    pass
+
+
+class BenchmarkCommand(BaseCommand):
+    """Команда, которая создает временные данные и замеряет на них API.
+
+    Все, что создано в ``run``, откатывается после завершения команды.
+    Кэш на время замера заменяется отдельным в памяти процесса, чтобы
+    записи по откатываемым данным не попали в общий кэш.
+    """
+
+    isolated_caches = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }}
+
+    def handle(self, *args, **options):
+        try:
+            with override_settings(CACHES=self.isolated_caches), \
+                    transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, **options):
+        raise NotImplementedError
+
+    @staticmethod
+    def get_client(user=None):
+        client = APIClient(SERVER_NAME='localhost')
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    @staticmethod
+    def count_queries(func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            result = func(*args, **kwargs)
+        return result, len(context)
+
+    @staticmethod
+    def measure(func, repeat=1):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return timings
@@ -0,0 +1,81 @@
+import time
+from contextlib import contextmanager
+from itertools import cycle
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import CachedTokenAuthentication, token_cache
+from users.views import UserViewSet
+
+from ...views import RecipeViewSet, TagViewSet
+from ..benchmark import BenchmarkCommand, percentile
+from ..fixtures import create_users
+
+AUTHENTICATION_CLASSES = (TokenAuthentication, CachedTokenAuthentication)
+ENDPOINTS = (
+    ('tags', TagViewSet, '/api/tags/'),
+    ('users me', UserViewSet, '/api/users/me/'),
+    ('recipes list', RecipeViewSet, '/api/recipes/'),
+)
+
+
+@contextmanager
+def authentication_class(authentication):
+    """Подменяет аутентификацию у представлений из ENDPOINTS.
+
+    Классы аутентификации DRF читаются из настроек при импорте
+    представления, поэтому override_settings здесь не поможет.
+    """
+    previous = {view: view.authentication_classes
+                for _, view, _ in ENDPOINTS}
+    for view in previous:
+        view.authentication_classes = [authentication]
+    try:
+        yield
+    finally:
+        for view, classes in previous.items():
+            view.authentication_classes = classes
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает пропускную способность запросов с токеном при '
+        'TokenAuthentication и CachedTokenAuthentication.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=50)
+
+    def run(self, **options):
+        clients = []
+        for user in create_users(options['users']):
+            client = APIClient(SERVER_NAME='localhost')
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}'
+            )
+            clients.append(client)
+        for name, _, url in ENDPOINTS:
+            for authentication in AUTHENTICATION_CLASSES:
+                token_cache.clear()
+                with authentication_class(authentication):
+                    self.bench(f'{name}, {authentication.__name__}',
+                               clients, url, options['requests'])
+
+    def bench(self, label, clients, url, requests):
+        # Первый проход по всем токенам заполняет кэш.
+        for client in clients:
+            client.get(url)
+        (response, queries), = [self.count_queries(clients[0].get, url)]
+        assert response.status_code == 200, response.status_code
+        client_cycle = cycle(clients)
+        start = time.perf_counter()
+        timings = self.measure(lambda: next(client_cycle).get(url), requests)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{label}: {requests / elapsed:.0f} запросов/с, '
+            f'p50 {percentile(timings, 0.5) * 1000:.2f} мс, '
+            f'p99 {percentile(timings, 0.99) * 1000:.2f} мс, '
+            f'{queries} запросов к БД'
+        )
@@ -0,0 +1,338 @@
+import base64
+import io
+import json
+import platform
+import statistics
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connection
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from users.batch import follow_batch
+
+from ...batch import favorite_batch, shopping_cart_batch
+from ...models import Ingredient, Recipe, Tag
+from ...utils import EXPORT_FORMATS
+from ..benchmark import BenchmarkCommand, percentile
+
+User = get_user_model()
+
+Case = namedtuple('Case', 'name client method url data before after',
+                  defaults=(None, None, None))
+
+BENCH_PASSWORD = 'bench-Password-1'
+NEW_USER = {
+    'email': 'bench@example.com',
+    'username': 'bench',
+    'first_name': 'Замер',
+    'last_name': 'Замер',
+    'password': BENCH_PASSWORD,
+}
+
+
+def delete_new_user(response):
+    User.objects.filter(username=NEW_USER['username']).delete()
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Замеряет задержку и число SQL-запросов для маршрутов API '
+        'на заполненной базе (см. manage.py seed). Кроме GET и DELETE '
+        'recipes/<id>/favorite/, recipes/<id>/shopping_cart/ и '
+        'users/<id>/subscribe/: они работают в пуле потоков со своими '
+        'соединениями и не видят откатываемую транзакцию замера, поэтому '
+        'их замеряет manage.py bench_toggles.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', help='Запускать только случаи, '
+                                           'в названии которых есть строка.')
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument('--compare', help='JSON прошлого запуска.')
+
+    def run(self, **options):
+        results = {}
+        for case in self.get_cases():
+            if options['only'] and options['only'] not in case.name:
+                continue
+            results[case.name] = self.bench(case, options)
+            self.report(case.name, results[case.name])
+        if options['compare']:
+            self.compare(options['compare'], results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'meta': self.get_meta(options),
+                           'results': results},
+                          file, ensure_ascii=False, indent=2)
+
+    def bench(self, case, options):
+        timings = []
+        statuses = set()
+        queries = None
+        for iteration in range(options['warmup'] + options['repeat']):
+            if case.before:
+                case.before()
+            url = case.url() if callable(case.url) else case.url
+            call = getattr(case.client, case.method)
+            kwargs = {} if case.data is None else {
+                'data': case.data() if callable(case.data) else case.data,
+                'format': 'json',
+            }
+            (response, count), timing = self.timed(call, url, **kwargs)
+            if case.after:
+                case.after(response)
+            if iteration < options['warmup']:
+                continue
+            if queries is None:
+                queries = count
+            statuses.add(response.status_code)
+            timings.append(timing)
+        return {
+            'status': sorted(statuses),
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p90_ms': round(percentile(timings, 0.9) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'mean_ms': round(statistics.mean(timings) * 1000, 2),
+        }
+
+    def timed(self, func, *args, **kwargs):
+        result = []
+        timing, = self.measure(
+            lambda: result.append(self.count_queries(func, *args, **kwargs))
+        )
+        return result[0], timing
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<36} {",".join(map(str, result["status"])):<8} '
+            f'p50 {result["p50_ms"]:>8.1f} мс  '
+            f'p90 {result["p90_ms"]:>8.1f} мс  '
+            f'p99 {result["p99_ms"]:>8.1f} мс  '
+            f'{result["queries"]:>3} запросов'
+        )
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as file:
+            previous = json.load(file)['results']
+        self.stdout.write('Сравнение с прошлым запуском:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            old = previous[name]
+            change = (result['p50_ms'] - old['p50_ms']) / (
+                old['p50_ms'] or 1
+            ) * 100
+            self.stdout.write(
+                f'{name:<36} p50 {old["p50_ms"]:.1f} -> '
+                f'{result["p50_ms"]:.1f} мс ({change:+.0f}%), запросов '
+                f'{old["queries"]} -> {result["queries"]}'
+            )
+
+    @staticmethod
+    def get_meta(options):
+        return {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'repeat': options['repeat'],
+            'recipes': Recipe.objects.count(),
+            'users': User.objects.count(),
+        }
+
+    def get_cases(self):
+        user = User.objects.filter(
+            follower__isnull=False, favorited__isnull=False,
+            shopping_cart__isnull=False,
+        ).first()
+        recipe = Recipe.objects.exclude(author=user).order_by('-id').first()
+        if user is None or recipe is None:
+            raise CommandError('Сначала заполните базу: manage.py seed')
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+        other = User.objects.exclude(id=user.id).exclude(
+            following__user=user
+        ).first()
+        clients = {
+            'anon': self.get_client(),
+            'user': self.get_client(user),
+            'author': self.get_client(recipe.author),
+        }
+        return (
+            self.reference_cases(clients)
+            + self.recipe_list_cases(clients)
+            + self.recipe_cases(clients, user, recipe)
+            + self.user_cases(clients, user, other)
+            + self.batch_cases(clients, user)
+        )
+
+    @staticmethod
+    def reference_cases(clients):
+        ingredient = Ingredient.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        anon = clients['anon']
+        return [
+            Case('ingredients list', anon, 'get', '/api/ingredients/'),
+            Case('ingredients search', anon, 'get',
+                 f'/api/ingredients/?name={ingredient.name[:3]}'),
+            Case('ingredient detail', anon, 'get',
+                 f'/api/ingredients/{ingredient.id}/'),
+            Case('tags list', anon, 'get', '/api/tags/'),
+            Case('tag detail', anon, 'get', f'/api/tags/{tag.id}/'),
+        ]
+
+    @staticmethod
+    def recipe_list_cases(clients):
+        tag = Tag.objects.order_by('id').first()
+        recipe = Recipe.objects.order_by('id').first()
+        word = recipe.name.split()[-1]
+        return [
+            Case('recipes list anon', clients['anon'], 'get',
+                 '/api/recipes/'),
+        ] + [
+            Case(f'recipes list {name}', clients['user'], 'get',
+                 f'/api/recipes/?{query}')
+            for name, query in (
+                ('auth', ''),
+                ('limit=60', 'limit=60'),
+                ('page=50', 'page=50'),
+                ('cursor', 'cursor='),
+                ('tags', f'tags={tag.slug}'),
+                ('author', f'author={recipe.author_id}'),
+                ('is_favorited', 'is_favorited=1'),
+                ('is_in_shopping_cart', 'is_in_shopping_cart=1'),
+                ('search', f'search={word}'),
+            )
+        ] + [
+            Case('feed', clients['user'], 'get', '/api/recipes/feed/'),
+        ]
+
+    @staticmethod
+    def recipe_payload():
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+        image = base64.b64encode(buffer.getvalue()).decode()
+        return {
+            'name': 'Замер',
+            'text': 'Рецепт для замера',
+            'cooking_time': 10,
+            'image': f'data:image/png;base64,{image}',
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in Ingredient.objects.order_by(
+                    'id'
+                ).values_list('id', flat=True)[:6]
+            ],
+            'tags': list(
+                Tag.objects.order_by('id').values_list('id', flat=True)[:2]
+            ),
+        }
+
+    @staticmethod
+    def update_payload(recipe):
+        amounts = recipe.recipe_ingredients.values_list(
+            'ingredient_id', 'amount'
+        )
+        return {
+            'name': recipe.name,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount % 500 + 1}
+                for ingredient_id, amount in amounts
+            ],
+            'tags': list(recipe.recipe_tags.values_list('tag_id', flat=True)),
+        }
+
+    def recipe_cases(self, clients, user, recipe):
+        user_client, author_client = clients['user'], clients['author']
+        created = []
+        base = f'/api/recipes/{recipe.id}'
+
+        def create_recipe():
+            created.append(Recipe.objects.create(
+                author=user, name='Замер', text='Замер', cooking_time=1,
+                image=recipe.image.name,
+            ).id)
+
+        return [
+            Case('recipe detail anon', clients['anon'], 'get', f'{base}/'),
+            Case('recipe detail auth', user_client, 'get', f'{base}/'),
+            Case('recipe create', user_client, 'post', '/api/recipes/',
+                 data=self.recipe_payload(),
+                 after=lambda response: Recipe.objects.filter(
+                     id=response.data['id']
+                 ).delete()),
+            Case('recipe update', author_client, 'patch', f'{base}/',
+                 data=lambda: self.update_payload(recipe)),
+            Case('recipe delete', user_client, 'delete',
+                 lambda: f'/api/recipes/{created.pop()}/',
+                 before=create_recipe),
+            Case('shopping_list', user_client, 'get',
+                 '/api/recipes/shopping_list/'),
+            Case('download_shopping_cart', user_client, 'get',
+                 '/api/recipes/download_shopping_cart/'),
+        ] + [
+            Case(f'download_shopping_cart {export_format}', user_client,
+                 'get', f'/api/recipes/download_shopping_cart/'
+                        f'?format={export_format}')
+            for export_format in EXPORT_FORMATS if export_format != 'pdf'
+        ]
+
+    def user_cases(self, clients, user, other):
+        user_client = clients['user']
+        return [
+            Case('users list anon', clients['anon'], 'get', '/api/users/'),
+            Case('users list auth', user_client, 'get', '/api/users/'),
+            Case('user detail', user_client, 'get',
+                 f'/api/users/{other.id}/'),
+            Case('users me', user_client, 'get', '/api/users/me/'),
+            Case('user create', clients['anon'], 'post', '/api/users/',
+                 data=NEW_USER,
+                 after=delete_new_user),
+            Case('subscriptions', user_client, 'get',
+                 '/api/users/subscriptions/?recipes_limit=3'),
+            Case('set_password', user_client, 'post',
+                 '/api/users/set_password/',
+                 data={'new_password': BENCH_PASSWORD,
+                       'current_password': BENCH_PASSWORD}),
+            Case('token login', clients['anon'], 'post',
+                 '/api/auth/token/login/',
+                 data={'email': user.email, 'password': BENCH_PASSWORD}),
+            Case('token logout', user_client, 'post',
+                 '/api/auth/token/logout/',
+                 before=lambda: Token.objects.get_or_create(user=user)),
+        ]
+
+    @staticmethod
+    def batch_cases(clients, user, size=20):
+        recipe_ids = list(Recipe.objects.exclude(
+            favorited__user=user
+        ).exclude(shopping_cart__user=user).order_by(
+            'id'
+        ).values_list('id', flat=True)[:size])
+        author_ids = list(User.objects.exclude(id=user.id).exclude(
+            following__user=user
+        ).order_by('id').values_list('id', flat=True)[:size])
+        cases = []
+        for name, url, batch, ids in (
+            ('favorite', '/api/recipes/favorite/', favorite_batch,
+             recipe_ids),
+            ('shopping_cart', '/api/recipes/shopping_cart/',
+             shopping_cart_batch, recipe_ids),
+            ('subscribe', '/api/users/subscribe/', follow_batch, author_ids),
+        ):
+            cases += [
+                Case(f'{name} batch add', clients['user'], 'post', url,
+                     data={'add': ids},
+                     after=lambda response, batch=batch, ids=ids:
+                     batch.apply(user, [], ids)),
+                Case(f'{name} batch remove', clients['user'], 'post', url,
+                     data={'remove': ids},
+                     before=lambda batch=batch, ids=ids:
+                     batch.apply(user, ids, [])),
+            ]
+        return cases
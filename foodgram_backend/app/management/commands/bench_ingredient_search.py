@@ -0,0 +1,62 @@
+import csv
+import os
+import random
+import statistics
+
+from django.conf import settings
+
+from ...autocomplete import ingredient_index
+from ...models import Ingredient
+from ..benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает автодополнение ингредиентов через ORM '
+        '(istartswith) и через индекс в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--limit', type=int,
+                            default=settings.INGREDIENT_SEARCH_LIMIT)
+
+    def run(self, **options):
+        with open(os.path.join(settings.DATA_DIR, 'ingredients.csv'),
+                  encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in csv.reader(file)),
+                ignore_conflicts=True
+            )
+        ingredient_index.invalidate()
+        build_time, = self.measure(ingredient_index.get_data)
+        self.stdout.write(f'построение индекса: {build_time * 1000:.1f} мс')
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        rnd = random.Random(0)
+        queries = [
+            name[:rnd.randint(1, 5)]
+            for name in rnd.choices(names, k=options['queries'])
+        ]
+        limit = options['limit']
+        paths = {
+            'ORM': lambda query: list(
+                Ingredient.objects.filter(name__istartswith=query).values(
+                    'id', 'name', 'measurement_unit'
+                )
+            ),
+            'индекс': lambda query: ingredient_index.search(query, limit),
+            'индекс, fuzzy': lambda query: ingredient_index.search(
+                query, limit, fuzzy=True
+            ),
+        }
+        for label, search in paths.items():
+            timings = [
+                self.measure(lambda: search(query))[0] for query in queries
+            ]
+            self.stdout.write(
+                f'{label}: медиана {statistics.median(timings) * 1e6:.0f} '
+                f'мкс, p95 '
+                f'{statistics.quantiles(timings, n=20)[-1] * 1e6:.0f} мкс'
+            )
+        ingredient_index.invalidate()
@@ -0,0 +1,49 @@
+import statistics
+
+from django.conf import settings
+
+from ...models import Recipe
+from ...pagination import KeysetPagination
+from ..benchmark import BenchmarkCommand
+from ..fixtures import (create_ingredients, create_recipes, create_tags,
+                        create_users)
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает первую и глубокую страницу списка рецептов при '
+        'пагинации по номеру страницы и по курсору.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run(self, **options):
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        deep_page = options['page']
+        create_recipes(
+            page_size * deep_page, create_users(50), create_tags(3),
+            create_ingredients(10),
+            ingredients_per_recipe=1, tags_per_recipe=1,
+        )
+        deep_recipe = Recipe.objects.order_by('-pub_date', 'id')[
+            page_size * (deep_page - 1) - 1
+        ]
+        deep_cursor = KeysetPagination.encode_cursor(
+            [str(deep_recipe.pub_date), str(deep_recipe.id)], False
+        )
+        client = self.get_client()
+        for label, url in (
+            ('page, первая', '/api/recipes/?page=1'),
+            (f'page, {deep_page}-я', f'/api/recipes/?page={deep_page}'),
+            ('cursor, первая', '/api/recipes/?cursor='),
+            (f'cursor, {deep_page}-я', f'/api/recipes/?cursor={deep_cursor}'),
+        ):
+            (response, queries), = [self.count_queries(client.get, url)]
+            assert response.status_code == 200, response.status_code
+            timings = self.measure(lambda: client.get(url), options['repeat'])
+            self.stdout.write(
+                f'{label}: {statistics.median(timings) * 1000:.1f} мс, '
+                f'{queries} запросов'
+            )
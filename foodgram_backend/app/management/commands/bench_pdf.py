@@ -0,0 +1,39 @@
+import statistics
+import tracemalloc
+
+from ...utils import pdf_create, register_font
+from ..benchmark import BenchmarkCommand
+
+
+class Command(BenchmarkCommand):
+    help = 'Замеряет генерацию PDF со списком покупок разного размера.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1, 100, 5000]
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run(self, **options):
+        font_time, = self.measure(register_font)
+        self.stdout.write(f'регистрация шрифта: {font_time * 1000:.1f} мс')
+        for size in options['sizes']:
+            products = [
+                {'name': f'продукт {i}', 'amount': i, 'measurement_unit': 'г'}
+                for i in range(size)
+            ]
+            timings = self.measure(
+                lambda: pdf_create(products).close(), options['repeat']
+            )
+            tracemalloc.start()
+            pdf = pdf_create(products)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            pdf.seek(0, 2)
+            self.stdout.write(
+                f'{size} продуктов: '
+                f'{statistics.median(timings) * 1000:.1f} мс (медиана), '
+                f'{pdf.tell() / 1024:.0f} КБ, '
+                f'пик памяти {peak / 1024 / 1024:.1f} МБ'
+            )
+            pdf.close()
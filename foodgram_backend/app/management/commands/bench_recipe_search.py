@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.db.models import Q
+
+from ...models import Recipe
+from ...search import recipe_search
+from ..benchmark import BenchmarkCommand
+from ..fixtures import (create_ingredients, create_recipes, create_tags,
+                        create_users)
+
+DISHES = [
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'котлеты', 'блины', 'плов',
+    'запеканка', 'омлет', 'рагу', 'жаркое', 'пельмени', 'сырники',
+    'солянка', 'уха', 'шарлотка', 'оладьи', 'гуляш', 'паста',
+]
+WORDS = DISHES + [f'вкус{i}' for i in range(1000)]
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Сравнивает поиск рецептов по индексу с поиском через icontains '
+        'на большом наборе данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run(self, **options):
+        ingredients = create_ingredients(200)
+        create_recipes(
+            options['recipes'], create_users(100), create_tags(5),
+            ingredients, ingredients_per_recipe=3, tags_per_recipe=1,
+            words=WORDS,
+        )
+        start = time.perf_counter()
+        recipe_search.rebuild(
+            Recipe.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(
+            f'Индекс построен за {time.perf_counter() - start:.1f} с'
+        )
+        for query in ('борщ', 'вкус7', 'пирог вкус1',
+                      ingredients[0].name):
+            indexed = recipe_search.filter(Recipe.objects.all(), query)
+            naive = self.naive_search(query)
+            self.stdout.write(
+                f'«{query}»: найдено {indexed.count()}, '
+                f'индекс {self.first_page_ms(indexed, options):.1f} мс, '
+                f'icontains {self.first_page_ms(naive, options):.1f} мс'
+            )
+
+    def first_page_ms(self, queryset, options):
+        timings = self.measure(
+            lambda: (queryset.count(), list(queryset.all()[:6])),
+            options['repeat']
+        )
+        return statistics.median(timings) * 1000
+
+    @staticmethod
+    def naive_search(query):
+        condition = Q()
+        for term in query.split():
+            condition &= (
+                Q(name__icontains=term) | Q(text__icontains=term)
+                | Q(ingredients__name__icontains=term)
+            )
+        return Recipe.objects.filter(condition).distinct().order_by(
+            '-pub_date', 'id'
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.cache import cache
+
+from ..benchmark import BenchmarkCommand, percentile
+from ..render_cases import create_render_data, get_cases, get_content
+
+MODES = (
+    ('сериализатор', False, True),
+    ('быстрый путь', True, True),
+    ('быстрый путь из кэша', True, False),
+)
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Замеряет процессорное время ответа списка рецептов, ингредиентов '
+        'и пользователей через сериализаторы и через быстрые пути.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=60)
+
+    def run(self, **options):
+        viewer, recipes = create_render_data(options['page_size'])
+        client = self.get_client(viewer)
+        for name, url, _ in get_cases(viewer, recipes[0].id,
+                                      options['page_size']):
+            baseline = None
+            for mode, fast, cold in MODES:
+                get_content(client, url, fast)
+                timings = []
+                for _ in range(options['repeat']):
+                    if cold:
+                        cache.clear()
+                    start = time.process_time()
+                    get_content(client, url, fast, cold=False)
+                    timings.append(time.process_time() - start)
+                median = percentile(timings, 0.5)
+                baseline = baseline or median
+                self.stdout.write(
+                    f'{name:<16} {mode:<22} CPU p50 {median * 1000:7.2f} мс '
+                    f'({baseline / median:.1f}x)'
+                )
@@ -0,0 +1,52 @@
+import statistics
+import tracemalloc
+
+from ...utils import EXPORT_FORMATS
+from ..benchmark import BenchmarkCommand
+
+
+def generate_products(size):
+    return (
+        {'name': f'продукт {i}', 'amount': i, 'measurement_unit': 'г'}
+        for i in range(size)
+    )
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Замеряет время и пик памяти выгрузки списка покупок во всех '
+        'форматах для списков разного размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100, 5000, 50000]
+        )
+        parser.add_argument(
+            '--formats', nargs='+', choices=EXPORT_FORMATS,
+            default=['txt', 'csv', 'json']
+        )
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def run(self, **options):
+        for export_format in options['formats']:
+            create, _ = EXPORT_FORMATS[export_format]
+            for size in options['sizes']:
+                timings = self.measure(
+                    lambda: create(generate_products(size)).close(),
+                    options['repeat']
+                )
+                # Строки приходят из генератора, как из .iterator(), так
+                # что пик памяти показывает расход самой выгрузки.
+                tracemalloc.start()
+                file = create(generate_products(size))
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                file.seek(0, 2)
+                self.stdout.write(
+                    f'{export_format}, {size} продуктов: '
+                    f'{statistics.median(timings) * 1000:.1f} мс (медиана), '
+                    f'{file.tell() / 1024:.0f} КБ, '
+                    f'пик памяти {peak / 1024 / 1024:.1f} МБ'
+                )
+                file.close()
@@ -0,0 +1,164 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+from users.models import Follow
+
+from ...models import Favorite, Recipe, ShoppingCart
+from ..benchmark import percentile
+
+User = get_user_model()
+
+TARGETS_PER_USER = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность добавления и удаления избранного, '
+        'корзины и подписок при параллельных запросах к запущенному '
+        'серверу. Каждый поток работает от своего пользователя и '
+        'возвращает данные в исходное состояние.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Число запросов на каждый переключатель.')
+        parser.add_argument('--only', help='Запускать только переключатели, '
+                                           'в названии которых есть строка.')
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument('--compare', help='JSON прошлого запуска.')
+
+    def handle(self, *args, **options):
+        users = list(User.objects.order_by('id')[:options['concurrency']])
+        if len(users) < options['concurrency']:
+            raise CommandError('Сначала заполните базу: manage.py seed')
+        tokens = [Token.objects.get_or_create(user=user)[0].key
+                  for user in users]
+        results = {}
+        for name, prefix, targets in self.get_toggles(users):
+            if options['only'] and options['only'] not in name:
+                continue
+            results[name] = self.bench(
+                urlsplit(options['url']), prefix, list(zip(tokens, targets)),
+                options
+            )
+            self.report(name, results[name])
+        if options['compare']:
+            self.compare(options['compare'], results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'options': {
+                    key: options[key]
+                    for key in ('url', 'concurrency', 'requests')
+                }, 'results': results}, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def get_toggles(users):
+        recipe_ids = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)[
+                :TARGETS_PER_USER * 5
+            ]
+        )
+        author_ids = list(
+            User.objects.order_by('-id').values_list('id', flat=True)[
+                :TARGETS_PER_USER * 5
+            ]
+        )
+
+        def free(model, field, ids):
+            taken = set(model.objects.filter(user__in=users).values_list(
+                'user_id', field
+            ))
+            return [
+                [target for target in ids
+                 if (user.id, target) not in taken
+                 and target != user.id][:TARGETS_PER_USER]
+                for user in users
+            ]
+
+        return (
+            ('favorite', '/api/recipes/{}/favorite/',
+             free(Favorite, 'recipe_id', recipe_ids)),
+            ('shopping_cart', '/api/recipes/{}/shopping_cart/',
+             free(ShoppingCart, 'recipe_id', recipe_ids)),
+            ('subscribe', '/api/users/{}/subscribe/',
+             free(Follow, 'author_id', author_ids)),
+        )
+
+    def bench(self, url, prefix, workers, options):
+        """Каждый поток по кругу добавляет и удаляет свои объекты."""
+        per_worker = max(1, options['requests'] // len(workers) // 2)
+        timings = []
+        statuses = {}
+        lock = threading.Lock()
+
+        def work(token, targets):
+            connection = http.client.HTTPConnection(url.hostname, url.port)
+            headers = {'Authorization': f'Token {token}'}
+            local_timings = []
+            local_statuses = {}
+            for index in range(per_worker):
+                path = prefix.format(targets[index % len(targets)])
+                for method in ('GET', 'DELETE'):
+                    start = time.perf_counter()
+                    connection.request(method, path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    local_timings.append(time.perf_counter() - start)
+                    local_statuses[response.status] = local_statuses.get(
+                        response.status, 0
+                    ) + 1
+            connection.close()
+            with lock:
+                timings.extend(local_timings)
+                for code, count in local_statuses.items():
+                    statuses[code] = statuses.get(code, 0) + count
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(workers)) as executor:
+            for future in [executor.submit(work, token, targets)
+                           for token, targets in workers if targets]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        return {
+            'status': {str(code): count for code, count in statuses.items()},
+            'requests': len(timings),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p90_ms': round(percentile(timings, 0.9) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'mean_ms': round(statistics.mean(timings) * 1000, 2),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<16} {result["rps"]:>8.1f} запросов/с  '
+            f'p50 {result["p50_ms"]:>8.1f} мс  '
+            f'p90 {result["p90_ms"]:>8.1f} мс  '
+            f'p99 {result["p99_ms"]:>8.1f} мс  '
+            f'статусы {result["status"]}'
+        )
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as file:
+            previous = json.load(file)['results']
+        self.stdout.write('Сравнение с прошлым запуском:')
+        for name, result in results.items():
+            if name not in previous:
+                continue
+            old = previous[name]
+            change = (result['rps'] - old['rps']) / (old['rps'] or 1) * 100
+            self.stdout.write(
+                f'{name:<16} {old["rps"]:.1f} -> {result["rps"]:.1f} '
+                f'запросов/с ({change:+.0f}%), p99 {old["p99_ms"]:.1f} -> '
+                f'{result["p99_ms"]:.1f} мс'
+            )
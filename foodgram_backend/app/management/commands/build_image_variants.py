@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from ...images import build_variants_in_background, get_executor
+from ...models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные варианты картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересобрать варианты и для уже обработанных рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        )
+        futures = [
+            get_executor('thread').submit(
+                build_variants_in_background, recipe.id, recipe.image.name
+            )
+            for recipe in recipes.iterator()
+            if options['force']
+            or recipe.image_variants.get('source') != recipe.image.name
+        ]
+        built = sum(future.result() is not None for future in futures)
+        self.stdout.write(
+            f'Обработано рецептов: {built}, ошибок: {len(futures) - built}'
+        )
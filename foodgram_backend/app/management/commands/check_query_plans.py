@@ -0,0 +1,156 @@
+import random
+import re
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connection
+from users.managers import related_count
+from users.models import Follow
+
+from ...filters import RecipeFilter
+from ...models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                       ShoppingListItem)
+from ..benchmark import BenchmarkCommand
+from ..fixtures import (create_ingredients, create_recipes, create_tags,
+                        create_users)
+
+User = get_user_model()
+
+PlanCheck = namedtuple('PlanCheck', 'name queryset tables allow_sort vendors',
+                       defaults=(False, None))
+
+FULL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?(\w+)$', re.MULTILINE),
+}
+SORT = {
+    'postgresql': re.compile(r'\bSort\b'),
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+}
+
+
+class Command(BenchmarkCommand):
+    help = (
+        'Заполняет таблицы и проверяет по EXPLAIN, что горячие запросы '
+        'не читают таблицы целиком и не сортируют результат.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--users', type=int, default=2000)
+
+    def run(self, **options):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN:
+            raise CommandError(f'База {vendor} не поддерживается.')
+        user, author, recipe, tags, ingredient = self.seed(
+            options['recipes'], options['users']
+        )
+        failures = []
+        for check in self.get_checks(user, author, recipe, tags, ingredient):
+            if check.vendors and vendor not in check.vendors:
+                continue
+            plan = check.queryset.explain()
+            problems = [
+                f'полное чтение {table}'
+                for table in FULL_SCAN[vendor].findall(plan)
+                if table in check.tables
+            ]
+            if not check.allow_sort and SORT[vendor].search(plan):
+                problems.append('сортировка')
+            self.stdout.write(
+                f'{check.name}: ' + (', '.join(problems) or 'ok')
+            )
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+            if problems:
+                failures.append(check.name)
+        if failures:
+            raise CommandError(
+                'Планы запросов деградировали: ' + ', '.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке.'))
+
+    @staticmethod
+    def seed(recipes_count, users_count):
+        rnd = random.Random(0)
+        users = create_users(users_count)
+        tags = create_tags(10)
+        ingredients = create_ingredients(2000)
+        recipes = create_recipes(recipes_count, users, tags, ingredients,
+                                 ingredients_per_recipe=3)
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                (model(user=rnd.choice(users), recipe=rnd.choice(recipes))
+                 for _ in range(recipes_count)),
+                ignore_conflicts=True,
+            )
+        Follow.objects.bulk_create(
+            (Follow(user=rnd.choice(users), author=rnd.choice(users))
+             for _ in range(users_count * 5)),
+            ignore_conflicts=True,
+        )
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(user=rnd.choice(users),
+                              ingredient=rnd.choice(ingredients), amount=1)
+             for _ in range(recipes_count)),
+            ignore_conflicts=True,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return (users[0], recipes[0].author, recipes[0], tags[:2],
+                ingredients[0])
+
+    @staticmethod
+    def get_checks(user, author, recipe, tags, ingredient):
+        feed_ordering = ('-pub_date', 'id')
+        return [
+            PlanCheck('лента рецептов',
+                      Recipe.objects.order_by(*feed_ordering)[:6],
+                      ['app_recipe']),
+            PlanCheck('рецепты автора',
+                      Recipe.objects.filter(author=author)
+                      .order_by(*feed_ordering)[:6],
+                      ['app_recipe']),
+            PlanCheck('фильтр по любому из тегов',
+                      RecipeFilter({'tags': [tag.slug for tag in tags]},
+                                   Recipe.objects.all()).qs
+                      .order_by(*feed_ordering)[:6],
+                      ['app_recipe', 'app_recipetag'], allow_sort=True),
+            PlanCheck('фильтр по всем тегам',
+                      RecipeFilter({'tags': [tag.slug for tag in tags],
+                                    'tags_match': 'all'},
+                                   Recipe.objects.all()).qs
+                      .order_by(*feed_ordering)[:6],
+                      ['app_recipetag'], allow_sort=True),
+            PlanCheck('избранное рецепта',
+                      Favorite.objects.filter(recipe=recipe)
+                      .order_by().values('user_id'),
+                      ['app_favorite']),
+            PlanCheck('рецепт в корзине',
+                      ShoppingCart.objects.filter(recipe=recipe, user=user)
+                      .order_by(),
+                      ['app_shoppingcart']),
+            PlanCheck('счетчик избранного',
+                      Recipe.objects.filter(id=recipe.id).annotate(
+                          total=related_count(Favorite, 'recipe')
+                      ),
+                      ['app_recipe', 'app_favorite']),
+            PlanCheck('поиск ингредиента',
+                      Ingredient.objects.filter(
+                          name__istartswith=ingredient.name[:6]
+                      )[:20],
+                      ['app_ingredient'], allow_sort=True,
+                      vendors=['postgresql']),
+            PlanCheck('пользователи',
+                      User.objects.order_by('email', 'id')[:6],
+                      ['users_customuser']),
+            PlanCheck('подписки',
+                      User.objects.filter(following__user=user)
+                      .order_by('email', 'id')[:6],
+                      ['users_follow'], allow_sort=True),
+            PlanCheck('список покупок',
+                      ShoppingListItem.objects.filter(user=user).order_by(),
+                      ['app_shoppinglistitem']),
+        ]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ...models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводные списки покупок по корзинам и сравнивает '
+        'с сохраненными. С --fix заменяет расходящиеся записи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        expected = ShoppingListItem.objects.expected_totals()
+        stored = ShoppingListItem.objects.stored_totals()
+        deltas = {
+            key: expected.get(key, 0) - stored.get(key, 0)
+            for key in {*expected, *stored}
+            if expected.get(key, 0) != stored.get(key, 0)
+        }
+        for (user_id, ingredient_id), delta in sorted(deltas.items()):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'сохранено {stored.get((user_id, ingredient_id), 0)}, '
+                f'ожидалось {expected.get((user_id, ingredient_id), 0)}'
+            )
+        if not deltas:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        if not options['fix']:
+            raise CommandError(f'Найдено расхождений: {len(deltas)}.')
+        ShoppingListItem.objects.apply_deltas(deltas)
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено записей: {len(deltas)}.')
+        )
@@ -0,0 +1,79 @@
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from ...models import Recipe
+from ...storage import content_hash_storage
+
+MEDIA_DIR = 'recipe_pic'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок рецептов, на которые не ссылается '
+        'ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace-hours', type=int, default=24,
+            help='Не трогать файлы моложе указанного числа часов.'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        referenced = self.referenced_names(options['batch_size'])
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        removed = freed = 0
+        for name in self.walk(MEDIA_DIR):
+            # Список ссылок собран до обхода, поэтому перед удалением
+            # ссылки на файл проверяются еще раз.
+            if name in referenced or (
+                content_hash_storage.get_modified_time(name) > cutoff
+            ) or self.is_referenced(name):
+                continue
+            removed += 1
+            freed += content_hash_storage.size(name)
+            if not options['dry_run']:
+                content_hash_storage.delete(name)
+        self.stdout.write(
+            f'Удалено файлов: {removed}, освобождено '
+            f'{freed // 1024} КБ'
+            + (' (пробный запуск)' if options['dry_run'] else '')
+        )
+
+    @staticmethod
+    def referenced_names(batch_size):
+        referenced = set()
+        last_id = 0
+        while True:
+            rows = list(
+                Recipe.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'image', 'image_variants')[:batch_size]
+            )
+            if not rows:
+                return referenced
+            for last_id, image, variants in rows:
+                referenced.add(image)
+                referenced.update((variants or {}).values())
+
+    @staticmethod
+    def is_referenced(name):
+        condition = Q(image=name)
+        for key in ('source', *settings.RECIPE_IMAGE_VARIANTS):
+            condition |= Q(**{f'image_variants__{key}': name})
+        return Recipe.objects.filter(condition).exists()
+
+    def walk(self, directory):
+        if not content_hash_storage.exists(directory):
+            return
+        directories, files = content_hash_storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.walk(posixpath.join(directory, name))
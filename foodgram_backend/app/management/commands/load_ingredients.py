@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ...cache import ingredients_cache
+from ...models import Ingredient
+
+FIELD_ALIASES = (
+    ('name', 'measurement_unit'),
+    ('title', 'dimension'),
+)
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file, skip_header=False):
+    reader = csv.reader(file)
+    if skip_header:
+        next(reader, None)
+    for row in reader:
+        if row:
+            yield row[0], row[1]
+
+
+def iter_json_array(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив объектов.')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Файл JSON поврежден.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def read_json(file, skip_header=False):
+    for item in iter_json_array(file):
+        for name_key, unit_key in FIELD_ALIASES:
+            if name_key in item:
+                yield item[name_key], item[unit_key]
+                break
+        else:
+            raise CommandError(f'Неизвестный формат записи: {item}')
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON пачками. Повторная '
+        'загрузка не создает дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.DATA_DIR, 'ingredients.csv'),
+        )
+        parser.add_argument('--format', choices=READERS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-header', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        )
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        before = Ingredient.objects.count()
+        total = 0
+        start = time.perf_counter()
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = READERS[file_format](file, options['skip_header'])
+            while True:
+                batch = [
+                    Ingredient(name=name.strip(),
+                               measurement_unit=measurement_unit.strip())
+                    for name, measurement_unit in islice(
+                        rows, options['batch_size']
+                    )
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+        elapsed = time.perf_counter() - start
+        ingredients_cache.bump()
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {total}, добавлено: {created}, '
+            f'уже были: {total - created}. '
+            f'{total / elapsed if elapsed else total:.0f} строк/с.'
+        ))
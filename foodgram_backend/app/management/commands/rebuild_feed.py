@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.models import Follow
+
+from ...models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново собирает ленты подписок из подписок и последних рецептов '
+        'авторов. Нужен после массовой загрузки данных в обход сигналов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Число пользователей в одной транзакции.')
+
+    def handle(self, *args, **options):
+        user_ids = list(Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct().order_by('user_id'))
+        batch_size = options['batch_size']
+        FeedEntry.objects.exclude(
+            user_id__in=Follow.objects.values('user_id')
+        ).delete()
+        for start in range(0, len(user_ids), batch_size):
+            with transaction.atomic():
+                FeedEntry.objects.rebuild(user_ids[start:start + batch_size])
+        self.stdout.write(
+            f'Лент: {len(user_ids)}, записей: {FeedEntry.objects.count()}'
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ...models import Recipe
+from ...search import recipe_search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс рецептов.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipe_ids = list(
+            Recipe.objects.order_by('id').values_list('id', flat=True)
+        )
+        recipe_search.rebuild(recipe_ids)
+        self.stdout.write(f'Проиндексировано рецептов: {len(recipe_ids)}')
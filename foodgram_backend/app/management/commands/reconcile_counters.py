@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.managers import related_count
+from users.models import Follow
+
+from ...models import Favorite, Recipe, ShoppingCart
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счетчики избранного, списков покупок, рецептов и '
+        'подписчиков там, где они разошлись с данными.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for queryset, field, actual in (
+            (Recipe.objects.all(), 'favorited_count',
+             related_count(Favorite, 'recipe')),
+            (Recipe.objects.all(), 'in_cart_count',
+             related_count(ShoppingCart, 'recipe')),
+            (User.objects.all(), 'recipes_count',
+             related_count(Recipe, 'author')),
+            (User.objects.all(), 'followers_count',
+             related_count(Follow, 'author')),
+        ):
+            fixed = queryset.reconcile(field, actual)
+            self.stdout.write(
+                f'{queryset.model.__name__}.{field}: исправлено {fixed}'
+            )
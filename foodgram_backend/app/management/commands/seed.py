@@ -0,0 +1,113 @@
+import io
+import os
+import random
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image
+from users.models import Follow
+
+from ...models import Favorite, Ingredient, ShoppingCart, ShoppingListItem
+from ...search import recipe_search
+from ...storage import content_hash_storage
+from ..fixtures import create_recipes, create_tags, create_users
+
+DISHES = [
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'котлеты', 'блины', 'плов',
+    'запеканка', 'омлет', 'рагу', 'жаркое', 'пельмени', 'сырники',
+    'солянка', 'уха', 'шарлотка', 'оладьи', 'гуляш', 'паста', 'пицца',
+    'кекс', 'ризотто', 'лазанья', 'тефтели', 'голубцы', 'вареники',
+]
+DESCRIPTIONS = [
+    'домашний', 'быстрый', 'праздничный', 'постный', 'сытный', 'легкий',
+    'летний', 'зимний', 'острый', 'сладкий', 'нарезать', 'обжарить',
+    'запечь', 'отварить', 'смешать', 'подавать', 'горячим', 'холодным',
+    'с', 'зеленью', 'сметаной', 'соусом', 'минут', 'до', 'готовности',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, рецептами, тегами, '
+        'подписками, избранным и списками покупок.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--follows-per-user', type=int, default=10)
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--carts-per-user', type=int, default=3)
+        parser.add_argument(
+            '--ingredients-file',
+            default=os.path.join(settings.DATA_DIR, 'ingredients.csv'),
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        call_command('load_ingredients', options['ingredients_file'],
+                     stdout=self.stdout)
+        ingredients = list(Ingredient.objects.all())
+        users = create_users(options['users'])
+        tags = create_tags(options['tags'])
+        recipes = create_recipes(
+            options['recipes'], users, tags, ingredients,
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            tags_per_recipe=min(2, len(tags)),
+            seed=options['seed'],
+            words=DISHES + DESCRIPTIONS,
+            image=self.save_placeholder_image(),
+        )
+        self.stdout.write(
+            f'Пользователей: {len(users)}, тегов: {len(tags)}, '
+            f'рецептов: {len(recipes)}'
+        )
+        for model, fields, targets, per_user in (
+            (Follow, ('user', 'author'), users,
+             options['follows_per_user']),
+            (Favorite, ('user', 'recipe'), recipes,
+             options['favorites_per_user']),
+            (ShoppingCart, ('user', 'recipe'), recipes,
+             options['carts_per_user']),
+        ):
+            user_field, target_field = fields
+            model.objects.bulk_create(
+                (model(**{user_field: user, target_field: target})
+                 for user in users
+                 for target in rnd.sample(targets,
+                                          min(per_user, len(targets)))
+                 if target != user),
+                batch_size=5000,
+                ignore_conflicts=True,
+            )
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'{model.objects.count()}'
+            )
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_feed', stdout=self.stdout)
+        totals = ShoppingListItem.objects.expected_totals(
+            [user.id for user in users]
+        )
+        ShoppingListItem.objects.bulk_create(
+            (ShoppingListItem(user_id=user_id, ingredient_id=ingredient_id,
+                              amount=amount)
+             for (user_id, ingredient_id), amount in totals.items()),
+            batch_size=5000,
+        )
+        recipe_search.update(recipe.id for recipe in recipes)
+        self.stdout.write(self.style.SUCCESS('Данные созданы.'))
+
+    @staticmethod
+    def save_placeholder_image():
+        buffer = io.BytesIO()
+        Image.new('RGB', (960, 640), (230, 180, 120)).save(buffer, 'JPEG')
+        return content_hash_storage.save('recipe_pic/seed.jpg',
+                                         ContentFile(buffer.getvalue()))
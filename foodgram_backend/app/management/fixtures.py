@@ -0,0 +1,81 @@
+import random
+import uuid
+
+from app.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+def make_prefix():
+    return uuid.uuid4().hex[:8]
+
+
+def create_users(count, prefix=None):
+    prefix = prefix or make_prefix()
+    User.objects.bulk_create(
+        User(
+            username=f'{prefix}_{i}',
+            email=f'{prefix}_{i}@example.com',
+            first_name=f'Имя{i}',
+            last_name=f'Фамилия{i}',
+            password='!',
+        ) for i in range(count)
+    )
+    return list(User.objects.filter(username__startswith=f'{prefix}_'))
+
+
+def create_tags(count, prefix=None):
+    prefix = prefix or make_prefix()
+    Tag.objects.bulk_create(
+        Tag(
+            name=f'{prefix} тег {i}',
+            color=f'#{prefix[:2]}{i:04X}'[:7],
+            slug=f'{prefix}-{i}',
+        ) for i in range(count)
+    )
+    return list(Tag.objects.filter(slug__startswith=f'{prefix}-'))
+
+
+def create_ingredients(count, prefix=None):
+    prefix = prefix or make_prefix()
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'{prefix} ингредиент {i}', measurement_unit='г')
+        for i in range(count)
+    )
+    return list(Ingredient.objects.filter(name__startswith=f'{prefix} '))
+
+
+def create_recipes(count, authors, tags, ingredients,
+                   ingredients_per_recipe=5, tags_per_recipe=2,
+                   prefix=None, seed=0, words=None,
+                   image='recipe_pic/benchmark.png'):
+    prefix = prefix or make_prefix()
+    rnd = random.Random(seed)
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=rnd.choice(authors),
+            name=f'{prefix} рецепт {i}' + (
+                ' ' + ' '.join(rnd.choices(words, k=2)) if words else ''
+            ),
+            text=(' '.join(rnd.choices(words, k=12)) if words
+                  else 'Описание рецепта'),
+            cooking_time=rnd.randint(5, 120),
+            image=image,
+        ) for i in range(count)
+    )
+    recipes = list(Recipe.objects.filter(name__startswith=f'{prefix} '))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=rnd.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rnd.sample(
+            ingredients, min(ingredients_per_recipe, len(ingredients))
+        )
+    )
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rnd.sample(tags, min(tags_per_recipe, len(tags)))
+    )
+    return recipes
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from users.models import Follow
+from users.views import UserViewSet
+
+from ..models import Favorite, FeedEntry, Recipe, ShoppingCart
+from ..pagination import KeysetPagination
+from ..views import IngredientViewSet, RecipeViewSet
+from .benchmark import view_attribute
+from .fixtures import (create_ingredients, create_recipes, create_tags,
+                       create_users)
+
+VIEWS = (RecipeViewSet, IngredientViewSet, UserViewSet)
+
+
+def create_render_data(recipes, ingredients=2000, users=60):
+    """Данные для сравнения и замера быстрых путей выдачи."""
+    authors = create_users(users)
+    viewer = authors[0]
+    tags = create_tags(5)
+    created = create_recipes(recipes, authors, tags,
+                             create_ingredients(ingredients),
+                             ingredients_per_recipe=8, tags_per_recipe=2)
+    # Строки, которые JSON кодирует по-особому.
+    Recipe.objects.filter(id=created[0].id).update(
+        text='Кавычки " и \\ обратный слэш\nстрока\u2028абзац 😀'
+    )
+    Recipe.objects.filter(id=created[1].id).update(image_variants={
+        'source': created[1].image.name, 'card': 'recipe_pic/card.webp'
+    })
+    Follow.objects.bulk_create(Follow(user=viewer, author=author)
+                               for author in authors[1::2])
+    FeedEntry.objects.rebuild([viewer.id])
+    Favorite.objects.bulk_create(Favorite(user=viewer, recipe=recipe)
+                                 for recipe in created[::3])
+    ShoppingCart.objects.bulk_create(ShoppingCart(user=viewer, recipe=recipe)
+                                     for recipe in created[::4])
+    return viewer, created
+
+
+def get_cases(viewer, recipe_id, page_size):
+    # Курсор перед первым созданным пользователем, чтобы на странице
+    # оказались авторы, на которых подписан viewer.
+    users_cursor = KeysetPagination.encode_cursor(
+        [viewer.email.split('_')[0], '0'], False
+    )
+    return (
+        ('recipes list', f'/api/recipes/?limit={page_size}', True),
+        ('recipes cursor', f'/api/recipes/?cursor=&limit={page_size}', True),
+        ('recipe detail', f'/api/recipes/{recipe_id}/', True),
+        ('recipes feed', f'/api/recipes/feed/?limit={page_size}', False),
+        ('ingredients', '/api/ingredients/', True),
+        ('users list', f'/api/users/?limit={page_size}', True),
+        ('users cursor',
+         f'/api/users/?cursor={users_cursor}&limit={page_size}', True),
+    )
+
+
+def get_content(client, url, fast, cold=True):
+    """Ответ с быстрым путем или через сериализаторы.
+
+    ``cold`` очищает кэш перед запросом: без этого ответ рецептов и
+    ингредиентов берется из готового JSON и не проверяет сборку.
+    """
+    if cold:
+        cache.clear()
+    with view_attribute(VIEWS, 'fast_render', fast):
+        response = client.get(url)
+    assert response.status_code == 200, (url, response.status_code)
+    return response.content
@@ -1,32 +1,233 @@
-from django.db.models import Count, Manager, OuterRef
-from django.db.models.expressions import Exists
-from django.db.models.query import QuerySet
-
-
-class RecipeQueryset(QuerySet):
-    def annotate_favorited_flag(self, user):
-        from app.models import Favorite
-        return self.annotate(
-            is_favorited=Exists(Favorite.objects.filter(
-                recipe=OuterRef('id'),
-                user=user if user.is_authenticated else None
-            ))
-        )
+from collections import defaultdict
+from datetime import timedelta
 
-    def annotate_in_shopping_cart_flag(self, user):
-        from app.models import ShoppingCart
-        return self.annotate(
-            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
-                recipe=OuterRef('id'),
-                user=user if user.is_authenticated else None
-            ))
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Manager, Max, Prefetch, Sum
+from users.managers import CounterQueryset
+
+
+class RecipeQueryset(CounterQueryset):
+    def bump_version(self):
+        return self.increment('version')
+
+    def latest_by_authors(self, author_ids, limit=None):
+        fields = ('id', 'author_id', 'name', 'image', 'image_variants',
+                  'cooking_time', 'pub_date')
+        if limit is None:
+            return self.filter(author_id__in=author_ids).only(*fields)
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field) for field in fields)
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.raw(
+            f'SELECT {columns} FROM ('
+            f'SELECT {columns}, ROW_NUMBER() OVER ('
+            f'PARTITION BY {quote("author_id")} '
+            f'ORDER BY {quote("pub_date")} DESC, {quote("id")} DESC'
+            f') AS {quote("position")} '
+            f'FROM {quote(self.model._meta.db_table)} '
+            f'WHERE {quote("author_id")} IN ({placeholders})'
+            f') {quote("ranked")} WHERE {quote("position")} <= %s '
+            f'ORDER BY {quote("position")}',
+            [*author_ids, limit]
         )
 
-    def annotate_favorited_count(self):
-        return self.annotate(
-            favorited_count=Count('favorited')
+    def prefetch_recipe_data(self):
+        from app.models import RecipeIngredient
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
         )
 
 
 class RecipeManager(Manager.from_queryset(RecipeQueryset)):
     pass
+
+
+class FeedManager(Manager):
+    """Лента подписок, материализованная в таблице записей.
+
+    Новый рецепт сразу раскладывается по лентам подписчиков автора
+    (fan-out-on-write). Для авторов, у которых подписчиков больше
+    ``FEED_FANOUT_MAX_FOLLOWERS``, запись пропускается, а их рецепты
+    дочитываются в ленту при ее открытии (``pull_hot_authors``).
+    """
+
+    batch_size = 1000
+    # Запас на рецепты, сохраненные в параллельных транзакциях: их
+    # pub_date может оказаться раньше уже подтянутых в ленту.
+    pull_overlap = timedelta(minutes=5)
+
+    def add_entries(self, user_ids, recipes):
+        self.bulk_create(
+            [self.model(user_id=user_id, recipe_id=recipe.id,
+                        author_id=recipe.author_id, pub_date=recipe.pub_date)
+             for recipe in recipes for user_id in user_ids],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def fan_out(self, recipe):
+        from users.models import Follow
+        is_hot = get_user_model().objects.filter(
+            id=recipe.author_id,
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).exists()
+        if not is_hot:
+            self.add_entries(Follow.objects.filter(
+                author_id=recipe.author_id
+            ).values_list('user_id', flat=True).order_by(), [recipe])
+
+    def add_authors(self, user_id, author_ids):
+        from app.models import Recipe
+        author_ids = list(author_ids)
+        if author_ids:
+            self.add_entries([user_id], Recipe.objects.latest_by_authors(
+                author_ids, settings.FEED_BACKFILL
+            ))
+
+    def remove_authors(self, user_id, author_ids):
+        self.filter(user_id=user_id, author_id__in=author_ids).delete()
+
+    def pull_hot_authors(self, user_id):
+        from app.models import Recipe
+        from users.models import Follow
+        author_ids = list(Follow.objects.filter(
+            user_id=user_id,
+            author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('author_id', flat=True).order_by())
+        if not author_ids:
+            return
+        latest = self.filter(
+            user_id=user_id, author_id__in=author_ids
+        ).aggregate(latest=Max('pub_date'))['latest']
+        if latest is None:
+            self.add_authors(user_id, author_ids)
+            return
+        self.add_entries([user_id], Recipe.objects.filter(
+            author_id__in=author_ids,
+            pub_date__gte=latest - self.pull_overlap
+        ).only('id', 'author_id', 'pub_date').order_by())
+
+    def rebuild(self, user_ids):
+        from users.models import Follow
+        user_ids = list(user_ids)
+        self.filter(user_id__in=user_ids).delete()
+        authors = defaultdict(list)
+        for user_id, author_id in Follow.objects.filter(
+            user_id__in=user_ids
+        ).values_list('user_id', 'author_id').order_by():
+            authors[user_id].append(author_id)
+        for user_id, author_ids in authors.items():
+            self.add_authors(user_id, author_ids)
+
+
+class ShoppingListManager(Manager):
+    @staticmethod
+    def recipe_amounts(recipe_ids):
+        from app.models import RecipeIngredient
+        amounts = defaultdict(lambda: defaultdict(int))
+        for recipe_id, ingredient_id, amount in (
+            RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'ingredient_id', 'amount')
+        ):
+            amounts[recipe_id][ingredient_id] += amount
+        return amounts
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        deltas = defaultdict(int)
+        for amounts in self.recipe_amounts(recipe_ids).values():
+            for ingredient_id, amount in amounts.items():
+                deltas[user_id, ingredient_id] += sign * amount
+        self.apply_deltas(deltas)
+
+    def remove_recipes(self, user_id, recipe_ids):
+        self.add_recipes(user_id, recipe_ids, sign=-1)
+
+    def recipe_changed(self, recipe, old_amounts):
+        new_amounts = self.recipe_amounts([recipe.id])[recipe.id]
+        self.apply_recipe_changes(recipe, {
+            ingredient_id: new_amounts.get(ingredient_id, 0)
+            - old_amounts.get(ingredient_id, 0)
+            for ingredient_id in {*old_amounts, *new_amounts}
+        })
+
+    def apply_recipe_changes(self, recipe, changes):
+        from app.models import ShoppingCart
+        changes = {
+            ingredient_id: delta
+            for ingredient_id, delta in changes.items() if delta
+        }
+        if not changes:
+            return
+        user_ids = ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True).order_by()
+        self.apply_deltas({
+            (user_id, ingredient_id): delta
+            for user_id in user_ids
+            for ingredient_id, delta in changes.items()
+        })
+
+    def apply_deltas(self, deltas):
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        user_ids = sorted({user_id for user_id, _ in deltas})
+        ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+        get_user_model().objects.filter(id__in=user_ids).lock()
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(
+                user_id__in=user_ids, ingredient_id__in=ingredient_ids
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for (user_id, ingredient_id), delta in deltas.items():
+            item = items.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(self.model(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=delta
+                    ))
+                continue
+            item.amount += delta
+            if item.amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.id)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['amount'])
+        self.filter(id__in=to_delete).delete()
+
+    def expected_totals(self, user_ids=None):
+        from app.models import RecipeIngredient
+        condition = {'recipe__shopping_cart__isnull': False}
+        if user_ids is not None:
+            condition = {'recipe__shopping_cart__user_id__in': user_ids}
+        queryset = RecipeIngredient.objects.filter(**condition)
+        return {
+            (row['recipe__shopping_cart__user'], row['ingredient']):
+                row['total']
+            for row in queryset.values(
+                'recipe__shopping_cart__user', 'ingredient'
+            ).annotate(total=Sum('amount')).filter(total__gt=0).order_by()
+        }
+
+    def stored_totals(self, user_ids=None):
+        queryset = self.all()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in queryset.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).order_by()
+        }
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('app', 'Ingredient')
+    RecipeIngredient = apps.get_model('app', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('app', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        RecipeIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ).update(ingredient_id=group['keep_id'])
+        for item in ShoppingListItem.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ):
+            kept, _ = ShoppingListItem.objects.get_or_create(
+                user_id=item.user_id,
+                ingredient_id=group['keep_id'],
+                defaults={'amount': 0},
+            )
+            kept.amount += item.amount
+            kept.save()
+            item.delete()
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+    # Отложенные проверки внешних ключей PostgreSQL выполняются до
+    # AddConstraint: ALTER TABLE с ожидающими триггерами в той же
+    # транзакции завершается ошибкой.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
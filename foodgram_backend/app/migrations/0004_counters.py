@@ -0,0 +1,51 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:00
+
+from django.db import migrations, models
+import django.db.models.functions
+
+
+def count_related(model, field):
+    return django.db.models.functions.Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                **{field: models.OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('app', 'Recipe')
+    Favorite = apps.get_model('app', 'Favorite')
+    ShoppingCart = apps.get_model('app', 'ShoppingCart')
+    User = apps.get_model('users', 'CustomUser')
+    Recipe.objects.update(
+        favorited_count=count_related(Favorite, 'recipe'),
+        in_cart_count=count_related(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(recipes_count=count_related(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_unique_ingredient'),
+        ('users', '0002_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorited_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_cart_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:07
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=app.storage.ContentHashStorage(), upload_to='recipe_pic/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:09
+
+from django.db import migrations, models
+
+UPPER_NAME_PATTERN_INDEX = 'ingredient_upper_name_pattern_idx'
+
+
+def create_upper_name_pattern_index(apps, schema_editor):
+    # istartswith compiles to UPPER(name) LIKE UPPER(%s) on PostgreSQL;
+    # only an expression index with a pattern opclass can serve it, and
+    # Django 3.2 cannot declare one.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {UPPER_NAME_PATTERN_INDEX} '
+        f'ON app_ingredient (UPPER(name) text_pattern_ops)'
+    )
+
+
+def drop_upper_name_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {UPPER_NAME_PATTERN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_recipe_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', 'id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='cart_recipe_user_idx'),
+        ),
+        migrations.RunPython(create_upper_name_pattern_index,
+                             drop_upper_name_pattern_index),
+    ]
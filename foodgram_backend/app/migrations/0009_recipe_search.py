@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_TABLE = 'app_recipe_search'
+
+POSTGRES_CREATE = [
+    f'CREATE TABLE {SEARCH_TABLE} ('
+    f'recipe_id bigint PRIMARY KEY '
+    f'REFERENCES app_recipe (id) ON DELETE CASCADE '
+    f'DEFERRABLE INITIALLY DEFERRED, '
+    f'document tsvector NOT NULL)',
+    f'CREATE INDEX {SEARCH_TABLE}_document_idx '
+    f'ON {SEARCH_TABLE} USING GIN (document)',
+]
+POSTGRES_FILL = (
+    f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+    f"SELECT r.id, setweight(to_tsvector(%s::regconfig, r.name), 'A') || "
+    f'setweight(to_tsvector(%s::regconfig, '
+    f"coalesce(string_agg(i.name, ' '), '')), 'B') || "
+    f"setweight(to_tsvector(%s::regconfig, r.text), 'C') "
+    f'FROM app_recipe r '
+    f'LEFT JOIN app_recipeingredient ri ON ri.recipe_id = r.id '
+    f'LEFT JOIN app_ingredient i ON i.id = ri.ingredient_id '
+    f'GROUP BY r.id'
+)
+SQLITE_CREATE = [
+    f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5('
+    f"name, text, ingredients, tokenize='unicode61 remove_diacritics 2')",
+]
+SQLITE_FILL = (
+    f'INSERT INTO {SEARCH_TABLE} (rowid, name, text, ingredients) '
+    f"SELECT r.id, r.name, r.text, coalesce(group_concat(i.name, ' '), '') "
+    f'FROM app_recipe r '
+    f'LEFT JOIN app_recipeingredient ri ON ri.recipe_id = r.id '
+    f'LEFT JOIN app_ingredient i ON i.id = ri.ingredient_id '
+    f'GROUP BY r.id'
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+        config = settings.RECIPE_SEARCH_CONFIG
+        schema_editor.execute(POSTGRES_FILL, [config, config, config])
+    elif vendor == 'sqlite':
+        for sql in SQLITE_CREATE:
+            schema_editor.execute(sql)
+        schema_editor.execute(SQLITE_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
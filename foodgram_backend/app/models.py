@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from users.models import ProtectedFieldsMixin
 
-from .managers import RecipeManager
+from .managers import FeedManager, RecipeManager, ShoppingListManager
+from .storage import content_hash_storage
 
 User = get_user_model()
 
@@ -11,6 +13,16 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField('Единица измерения', max_length=20)
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'], name='unique_ingredient'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['name'],
+                         name='ingredient_name_pattern_idx',
+                         opclasses=['varchar_pattern_ops']),
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['name']
@@ -36,7 +48,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(ProtectedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.PROTECT,
@@ -46,7 +58,13 @@ class Recipe(models.Model):
     name = models.CharField('Название', max_length=200)
     text = models.TextField('Описание')
     cooking_time = models.PositiveIntegerField('Время приготовления')
-    image = models.ImageField('Картинка', upload_to='recipe_pic/')
+    image = models.ImageField('Картинка',
+                              upload_to='recipe_pic/',
+                              storage=content_hash_storage)
+    image_variants = models.JSONField('Варианты картинки',
+                                      default=dict,
+                                      blank=True,
+                                      editable=False)
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',
@@ -62,9 +80,28 @@ class Recipe(models.Model):
         verbose_name='Теги'
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorited_count = models.PositiveIntegerField('В избранном',
+                                                  default=0,
+                                                  editable=False,
+                                                  db_index=True)
+    in_cart_count = models.PositiveIntegerField('В списках покупок',
+                                                default=0,
+                                                editable=False,
+                                                db_index=True)
+    version = models.PositiveIntegerField('Версия',
+                                          default=1,
+                                          editable=False)
+    protected_fields = ('favorited_count', 'in_cart_count', 'version',
+                        'image_variants')
     objects = RecipeManager()
 
     class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', 'id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', 'id'],
+                         name='recipe_author_pub_date_idx'),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
@@ -104,6 +141,10 @@ class RecipeTag(models.Model):
                             verbose_name='Тег')
 
     class Meta:
+        indexes = [
+            models.Index(fields=['tag', 'recipe'],
+                         name='recipetag_tag_recipe_idx'),
+        ]
         verbose_name = 'Тег рецепта'
         verbose_name_plural = 'Теги рецепта'
         ordering = ['recipe', 'tag']
@@ -128,6 +169,10 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'], name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='favorite_recipe_user_idx'),
+        ]
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
         ordering = ['user', 'recipe']
@@ -152,9 +197,76 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_cart'
             )
         ]
+        indexes = [
+            models.Index(fields=['recipe', 'user'],
+                         name='cart_recipe_user_idx'),
+        ]
         verbose_name = 'Список продуктов'
         verbose_name_plural = 'Списки продуктов'
         ordering = ['user', 'recipe']
 
     def __str__(self):
         return f'{self.user.username} -> {self.recipe.name}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='shopping_list',
+                             verbose_name='Пользователь')
+    ingredient = models.ForeignKey(Ingredient,
+                                   on_delete=models.CASCADE,
+                                   related_name='shopping_list_items',
+                                   verbose_name='Ингредиент')
+    amount = models.PositiveIntegerField('Количество')
+    objects = ShoppingListManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+        verbose_name = 'Продукт из списка покупок'
+        verbose_name_plural = 'Сводные списки покупок'
+        ordering = ['user', 'ingredient']
+
+    def __str__(self):
+        return f'{self.user.username} -> {self.ingredient}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='feed',
+                             verbose_name='Подписчик')
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='feed_entries',
+                               verbose_name='Рецепт')
+    author = models.ForeignKey(User,
+                               on_delete=models.CASCADE,
+                               related_name='+',
+                               verbose_name='Автор')
+    pub_date = models.DateTimeField('Дата публикации')
+    objects = FeedManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', 'id'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ['-pub_date', 'id']
+
+    def __str__(self):
+        return f'{self.user.username} -> {self.recipe.name}'
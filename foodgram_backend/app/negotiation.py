@@ -0,0 +1,14 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FirstRendererNegotiation(DefaultContentNegotiation):
+    """Всегда выбирает первый рендерер представления.
+
+    Для выгрузок, которые отдают файл сами: параметр ``?format=`` у них
+    выбирает формат файла, а не рендерер DRF, а ошибки отдаются в JSON
+    при любом заголовке Accept.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        renderer = renderers[0]
+        return renderer, renderer.media_type
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class KeysetPagination(LimitPageNumberPagination):
+    """Постраничный вывод с опциональным режимом курсора.
+
+    Без параметра ``cursor`` работает как обычная пагинация по номеру
+    страницы. С ним (в том числе пустым) выдача упорядочивается по
+    ``view.cursor_ordering`` и продолжается с позиции из курсора без
+    COUNT(*) и OFFSET.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        self.ordering = view.cursor_ordering
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset.model
+        )
+        ordering = self.reverse_ordering() if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+        has_next, has_previous = has_more, position is not None
+        if reverse:
+            has_next, has_previous = has_previous, has_next
+        self.next_position = self.previous_position = None
+        if results and has_next:
+            self.next_position = self.get_position(results[-1])
+        if results and has_previous:
+            self.previous_position = self.get_position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_cursor_link(self.next_position, False)),
+            ('previous', self.get_cursor_link(self.previous_position, True)),
+            ('results', data),
+        ]))
+
+    def reverse_ordering(self):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        ]
+
+    def get_position(self, obj):
+        if isinstance(obj, dict):
+            return [str(obj[field.lstrip('-')]) for field in self.ordering]
+        return [
+            str(getattr(obj, field.lstrip('-'))) for field in self.ordering
+        ]
+
+    @staticmethod
+    def after(ordering, position):
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Избыточное условие по первому полю позволяет СУБД читать
+        # составной индекс диапазоном, а не проверять OR на каждой строке.
+        name = ordering[0].lstrip('-')
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{name}__{lookup}': position[0]}) & condition
+
+    def decode_cursor(self, cursor, model):
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = data['p'], bool(data['r'])
+            if (not isinstance(position, list)
+                    or len(position) != len(self.ordering)):
+                raise ValueError
+            position = [
+                self.to_python(model, field, value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (binascii.Error, ValueError, KeyError, TypeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def to_python(model, field, value):
+        value = model._meta.get_field(field.lstrip('-')).to_python(value)
+        if value is None:
+            raise ValueError
+        return value
+
+    @staticmethod
+    def encode_cursor(position, reverse):
+        data = json.dumps({'p': position, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse)
+        )
@@ -0,0 +1,163 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework.renderers import JSONRenderer
+
+from .models import Recipe
+from .representations import recipe_representations
+from .viewer import get_viewer_context
+
+FLAGS = {False: b'false', True: b'true'}
+
+
+class RecipeJsonCache:
+    """Готовый JSON рецептов без полей, зависящих от пользователя.
+
+    В ключ входит версия рецепта, поэтому после правки старая запись
+    просто перестает читаться. Флаги ``author.is_subscribed``,
+    ``is_favorited`` и ``is_in_shopping_cart`` подставляются в JSON при
+    каждом ответе. Промах по рецепту собирает один процесс, остальные
+    ждут его результата, а не сериализуют тот же рецепт параллельно.
+    """
+
+    fields = ('id', 'author_id', 'version', 'pub_date')
+    schema = 1
+    subscribed_suffix = b'false}'
+    flags_suffix = b'false,"is_in_shopping_cart":false}'
+
+    def __init__(self, timeout, lock_timeout=2, poll_interval=0.02):
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    def get_key(self, recipe, base_url):
+        return (f'recipe_json:{self.schema}:{recipe.id}:{recipe.version}:'
+                f'{hashlib.md5(base_url.encode()).hexdigest()}')
+
+    def render(self, recipes, request):
+        # Ссылки на картинки абсолютные, поэтому JSON зависит от хоста.
+        base_url = request.build_absolute_uri('/')
+        keys = {recipe.id: self.get_key(recipe, base_url)
+                for recipe in recipes}
+        cached = cache.get_many(keys.values())
+        parts = {recipe_id: cached[key] for recipe_id, key in keys.items()
+                 if key in cached}
+        missing = [recipe for recipe in recipes if recipe.id not in parts]
+        if missing:
+            parts.update(self.fill(missing, keys, request))
+        viewer = get_viewer_context(request)
+        return [self.overlay(parts[recipe.id], recipe, viewer)
+                for recipe in recipes if recipe.id in parts]
+
+    def fill(self, recipes, keys, request):
+        locks = {recipe.id: f'{keys[recipe.id]}:lock' for recipe in recipes}
+        owned = [recipe for recipe in recipes
+                 if cache.add(locks[recipe.id], 1, self.lock_timeout)]
+        try:
+            parts = self.build(owned, keys, request)
+        finally:
+            cache.delete_many([locks[recipe.id] for recipe in owned])
+        waiting = [recipe for recipe in recipes if recipe not in owned]
+        deadline = time.monotonic() + self.lock_timeout
+        while waiting and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            cached = cache.get_many([keys[recipe.id] for recipe in waiting])
+            for recipe in waiting:
+                if keys[recipe.id] in cached:
+                    parts[recipe.id] = cached[keys[recipe.id]]
+            waiting = [recipe for recipe in waiting
+                       if recipe.id not in parts]
+        # Если сборка в другом процессе не успела, собираем сами.
+        parts.update(self.build(waiting, keys, request))
+        return parts
+
+    def build(self, recipes, keys, request):
+        if not recipes:
+            return {}
+        parts = {
+            recipe_id: self.split(data)
+            for recipe_id, data in recipe_representations(
+                [recipe.id for recipe in recipes], request
+            ).items()
+        }
+        cache.set_many({keys[recipe_id]: recipe_parts
+                        for recipe_id, recipe_parts in parts.items()},
+                       self.timeout)
+        return parts
+
+    def split(self, data):
+        """Делит JSON рецепта на части между флагами пользователя."""
+        renderer = JSONRenderer()
+        author = renderer.render(data['author'])
+        content = renderer.render(data)
+        start = content.index(author)
+        return (
+            content[:start] + author[:-len(self.subscribed_suffix)],
+            b'}' + content[start + len(author):-len(self.flags_suffix)],
+        )
+
+    @staticmethod
+    def overlay(parts, recipe, viewer):
+        head, body = parts
+        return b''.join((
+            head,
+            FLAGS[recipe.author_id in viewer.followed_ids],
+            body,
+            FLAGS[recipe.id in viewer.favorited_ids],
+            b',"is_in_shopping_cart":',
+            FLAGS[recipe.id in viewer.cart_ids],
+            b'}',
+        ))
+
+
+class CachedRecipeMixin:
+    """Чтение рецептов через ``recipe_json_cache``.
+
+    Кэш используется только для ответов в обычном JSON; запросы к
+    браузерному API и с параметром ``indent`` идут через сериализатор,
+    как и все запросы при выключенном ``fast_render``.
+    """
+
+    fast_render = True
+
+    def uses_recipe_cache(self, request):
+        return (self.fast_render
+                and isinstance(request.accepted_renderer, JSONRenderer)
+                and 'indent' not in request.accepted_media_type)
+
+    def recipe_page_response(self, recipes):
+        envelope = JSONRenderer().render(
+            self.get_paginated_response([]).data
+        )
+        items = recipe_json_cache.render(recipes, self.request)
+        # Список results стоит в ответе пагинации последним.
+        return HttpResponse(envelope[:-len(b'[]}')] + b'[' + b','.join(items)
+                            + b']}', content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        if not self.uses_recipe_cache(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(
+            Recipe.objects.only(*RecipeJsonCache.fields)
+        )
+        return self.recipe_page_response(self.paginate_queryset(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.uses_recipe_cache(request):
+            return super().retrieve(request, *args, **kwargs)
+        recipe = get_object_or_404(
+            Recipe.objects.only(*RecipeJsonCache.fields),
+            pk=kwargs[self.lookup_field]
+        )
+        self.check_object_permissions(request, recipe)
+        contents = recipe_json_cache.render([recipe], request)
+        if not contents:
+            raise Http404
+        return HttpResponse(contents[0], content_type='application/json')
+
+
+recipe_json_cache = RecipeJsonCache(settings.RECIPE_JSON_CACHE_TTL)
@@ -0,0 +1,162 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+SEARCH_TABLE = 'app_recipe_search'
+MAX_TERMS = 10
+
+
+def parse_terms(query):
+    return re.findall(r'\w+', query.casefold())[:MAX_TERMS]
+
+
+class PostgresSearchBackend:
+    """tsvector в отдельной таблице с GIN-индексом."""
+
+    document_sql = (
+        "setweight(to_tsvector(%s::regconfig, r.name), 'A') || "
+        "setweight(to_tsvector(%s::regconfig, "
+        "coalesce(string_agg(i.name, ' '), '')), 'B') || "
+        "setweight(to_tsvector(%s::regconfig, r.text), 'C')"
+    )
+
+    def update(self, cursor, recipe_ids):
+        config = settings.RECIPE_SEARCH_CONFIG
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (recipe_id, document) '
+            f'SELECT r.id, {self.document_sql} '
+            f'FROM app_recipe r '
+            f'LEFT JOIN app_recipeingredient ri ON ri.recipe_id = r.id '
+            f'LEFT JOIN app_ingredient i ON i.id = ri.ingredient_id '
+            f'WHERE r.id = ANY(%s) GROUP BY r.id '
+            f'ON CONFLICT (recipe_id) '
+            f'DO UPDATE SET document = EXCLUDED.document',
+            [config, config, config, list(recipe_ids)]
+        )
+
+    def delete(self, cursor, recipe_ids):
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE recipe_id = ANY(%s)',
+            [list(recipe_ids)]
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {SEARCH_TABLE}')
+
+    join = f'{SEARCH_TABLE}.recipe_id = app_recipe.id'
+    match = f'{SEARCH_TABLE}.document @@ to_tsquery(%s::regconfig, %s)'
+    rank = f'ts_rank({SEARCH_TABLE}.document, to_tsquery(%s::regconfig, %s))'
+
+    @staticmethod
+    def get_params(terms):
+        params = [
+            settings.RECIPE_SEARCH_CONFIG,
+            ' & '.join(f'{term}:*' for term in terms),
+        ]
+        return params, params
+
+
+class SqliteSearchBackend:
+    """Виртуальная таблица FTS5 для локального запуска."""
+
+    def update(self, cursor, recipe_ids):
+        self.delete(cursor, recipe_ids)
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, text, ingredients) '
+            f"SELECT r.id, r.name, r.text, "
+            f"coalesce(group_concat(i.name, ' '), '') "
+            f'FROM app_recipe r '
+            f'LEFT JOIN app_recipeingredient ri ON ri.recipe_id = r.id '
+            f'LEFT JOIN app_ingredient i ON i.id = ri.ingredient_id '
+            f'WHERE r.id IN ({placeholders}) GROUP BY r.id',
+            list(recipe_ids)
+        )
+
+    def delete(self, cursor, recipe_ids):
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            list(recipe_ids)
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    join = f'{SEARCH_TABLE}.rowid = app_recipe.id'
+    match = f'{SEARCH_TABLE} MATCH %s'
+    rank = f'-bm25({SEARCH_TABLE}, 10.0, 1.0, 4.0)'
+
+    @staticmethod
+    def get_params(terms):
+        return [' '.join(f'"{term}"*' for term in terms)], []
+
+
+class RecipeSearch:
+    """Поиск рецептов по названию, описанию и ингредиентам."""
+
+    backends = {
+        'postgresql': PostgresSearchBackend(),
+        'sqlite': SqliteSearchBackend(),
+    }
+    batch_size = 500
+
+    def get_backend(self):
+        return self.backends.get(connection.vendor)
+
+    def update(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        backend = self.get_backend()
+        if backend is None or not recipe_ids:
+            return
+        with connection.cursor() as cursor:
+            for start in range(0, len(recipe_ids), self.batch_size):
+                backend.update(
+                    cursor, recipe_ids[start:start + self.batch_size]
+                )
+
+    def delete(self, recipe_ids):
+        backend = self.get_backend()
+        if backend is None:
+            return
+        with connection.cursor() as cursor:
+            backend.delete(cursor, list(recipe_ids))
+
+    def rebuild(self, recipe_ids):
+        backend = self.get_backend()
+        if backend is None:
+            return
+        with connection.cursor() as cursor:
+            backend.clear(cursor)
+        self.update(recipe_ids)
+
+    def filter(self, queryset, query, rank=True):
+        terms = parse_terms(query)
+        if not terms:
+            return queryset
+        backend = self.get_backend()
+        if backend is None:
+            condition = Q()
+            for term in terms:
+                condition &= (
+                    Q(name__icontains=term) | Q(text__icontains=term)
+                    | Q(ingredients__name__icontains=term)
+                )
+            return queryset.filter(condition).distinct()
+        match_params, rank_params = backend.get_params(terms)
+        queryset = queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[backend.join, backend.match],
+            params=match_params,
+        )
+        if not rank:
+            return queryset
+        return queryset.extra(
+            select={'search_rank': backend.rank},
+            select_params=rank_params,
+        ).order_by('-search_rank', '-pub_date', 'id')
+
+
+recipe_search = RecipeSearch()
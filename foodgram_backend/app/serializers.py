@@ -1,14 +1,21 @@
 import base64
-import uuid
+import binascii
+import tempfile
+from collections import defaultdict
 
-from app.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                        RecipeTag, ShoppingCart, Tag)
+from app.models import (Ingredient, Recipe, RecipeIngredient, RecipeTag,
+                        ShoppingListItem, Tag)
+from app.images import variant_urls
+from app.search import recipe_search
+from app.signals import manual_recipe_sync
+from app.viewer import get_viewer_context
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
-from rest_framework.validators import UniqueTogetherValidator
 
 from users.serializers import UserSerializer
 
@@ -16,15 +23,49 @@ User = get_user_model()
 
 
 class Base64ImageField(serializers.ImageField):
+    chunk_size = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
-            id = uuid.uuid4()
-            data = ContentFile(base64.b64decode(imgstr),
-                               name=id.urn[9:] + '.' + ext)
+            data = File(self.decode(imgstr), name='image.' + ext)
         return super(Base64ImageField, self).to_internal_value(data)
 
+    def decode(self, imgstr):
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if len(imgstr) // 4 * 3 > max_size + 2:
+            self.fail_too_large(max_size)
+        file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        try:
+            for start in range(0, len(imgstr), self.chunk_size):
+                file.write(base64.b64decode(
+                    imgstr[start:start + self.chunk_size], validate=True
+                ))
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError('Некорректная картинка.')
+        if file.tell() > max_size:
+            file.close()
+            self.fail_too_large(max_size)
+        file.seek(0)
+        return file
+
+    @staticmethod
+    def fail_too_large(max_size):
+        raise serializers.ValidationError(
+            f'Размер картинки не должен превышать {max_size // 1024} КБ.'
+        )
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return variant_urls(recipe, self.context.get('request'))
+
 
 class IngredientSerializer(serializers.ModelSerializer):
 
@@ -47,6 +88,18 @@ class RecipeIngredientSerializer(serializers.Serializer):
         model = RecipeIngredient
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+        model = ShoppingListItem
+
+
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -55,9 +108,10 @@ class TagSerializer(serializers.ModelSerializer):
 
 
 class RecipeCommonSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
         model = Recipe
 
 
@@ -66,73 +120,172 @@ class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
         source='recipe_ingredients', many=True
     )
-    is_favorited = serializers.BooleanField(default=False, read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(
-        default=False, read_only=True
-    )
+    is_favorited = SerializerMethodField()
+    is_in_shopping_cart = SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     def get_recipe_author(self, obj):
-        request = self.context.get('request')
-        author = User.objects.annotate_subscribed_flag(
-            request.user
-        ).get(id=obj.author.id)
-        return UserSerializer(instance=author).data
-
-    def add_recipe_ingredients(self, recipe, ingredients_data):
-        recipe_ingredients = (
+        return UserSerializer(instance=obj.author, context=self.context).data
+
+    def get_is_favorited(self, obj):
+        viewer = get_viewer_context(self.context.get('request'))
+        return obj.id in viewer.favorited_ids
+
+    def get_is_in_shopping_cart(self, obj):
+        viewer = get_viewer_context(self.context.get('request'))
+        return obj.id in viewer.cart_ids
+
+    def parse_ingredients(self, ingredients):
+        if not isinstance(ingredients, list):
+            raise serializers.ValidationError(
+                {'ingredients': 'Ожидался список ингредиентов.'}
+            )
+        amounts = {}
+        for ingredient in ingredients:
+            try:
+                ingredient_id = int(ingredient['id'])
+                amount = int(ingredient['amount'])
+            except (KeyError, TypeError, ValueError):
+                raise serializers.ValidationError({
+                    'ingredients': 'Для ингредиента нужно указать '
+                                   'целочисленные id и amount.'
+                })
+            if amount < 0:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Количество должно быть больше или '
+                                    'равно 0!'}
+                )
+            if ingredient_id in amounts:
+                raise serializers.ValidationError(
+                    {'ingredients': 'Ингредиенты не должны повторяться!'}
+                )
+            amounts[ingredient_id] = amount
+        missing = set(amounts) - set(Ingredient.objects.in_bulk(list(amounts)))
+        if missing:
+            raise serializers.ValidationError({
+                'ingredients': 'Ингредиенты не найдены: '
+                               + ', '.join(map(str, sorted(missing)))
+            })
+        return amounts
+
+    def parse_tags(self, tags):
+        if not isinstance(tags, list):
+            raise serializers.ValidationError(
+                {'tags': 'Ожидался список тегов.'}
+            )
+        try:
+            tag_ids = [int(tag_id) for tag_id in tags]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError(
+                {'tags': 'Теги нужно указывать целочисленными id.'}
+            )
+        if len(set(tag_ids)) != len(tag_ids):
+            raise serializers.ValidationError(
+                {'tags': 'Теги не должны повторяться!'}
+            )
+        missing = set(tag_ids) - set(Tag.objects.in_bulk(tag_ids))
+        if missing:
+            raise serializers.ValidationError({
+                'tags': 'Теги не найдены: '
+                        + ', '.join(map(str, sorted(missing)))
+            })
+        return tag_ids
+
+    def validate(self, data):
+        data.pop('recipe_ingredients', None)
+        if not self.partial or 'ingredients' in self.initial_data:
+            data['ingredient_amounts'] = self.parse_ingredients(
+                self.initial_data.get('ingredients')
+            )
+        if not self.partial or 'tags' in self.initial_data:
+            data['tag_ids'] = self.parse_tags(self.initial_data.get('tags'))
+        return data
+
+    def add_recipe_ingredients(self, recipe, amounts):
+        RecipeIngredient.objects.bulk_create(
             RecipeIngredient(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(id=ingredient_data['id']),
-                amount=ingredient_data['amount']
-            ) for ingredient_data in ingredients_data)
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
-
-    def add_recipe_tags(self, recipe, tags_data):
-        recipe_tags = (
-            RecipeTag(
-                recipe=recipe,
-                tag=Tag.objects.get(id=tag_id)
-            ) for tag_id in tags_data)
-        RecipeTag.objects.bulk_create(recipe_tags)
+                ingredient_id=ingredient_id,
+                amount=amount
+            ) for ingredient_id, amount in amounts.items()
+        )
+
+    def add_recipe_tags(self, recipe, tag_ids):
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag_id=tag_id) for tag_id in tag_ids
+        )
+
+    def update_recipe_ingredients(self, recipe, amounts):
+        changes = defaultdict(int)
+        current = {}
+        to_delete = []
+        for recipe_ingredient in recipe.recipe_ingredients.all():
+            ingredient_id = recipe_ingredient.ingredient_id
+            changes[ingredient_id] -= recipe_ingredient.amount
+            if ingredient_id in amounts and ingredient_id not in current:
+                current[ingredient_id] = recipe_ingredient
+            else:
+                to_delete.append(recipe_ingredient.id)
+        to_create, to_update = [], []
+        for ingredient_id, amount in amounts.items():
+            changes[ingredient_id] += amount
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        RecipeIngredient.objects.bulk_create(to_create)
+        RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_delete:
+            RecipeIngredient.objects.filter(id__in=to_delete).delete()
+        return changes
+
+    def update_recipe_tags(self, recipe, tag_ids):
+        current = set(recipe.recipe_tags.values_list('tag_id', flat=True))
+        self.add_recipe_tags(
+            recipe, [tag_id for tag_id in tag_ids if tag_id not in current]
+        )
+        if current - set(tag_ids):
+            recipe.recipe_tags.exclude(tag_id__in=tag_ids).delete()
 
     @transaction.atomic
     def create(self, validated_data):
-        request = self.context.get('request')
-        ingredients_data = request.data['ingredients']
-        for ingredient in ingredients_data:
-            if int(ingredient['amount']) < 0:
-                raise serializers.ValidationError(
-                    'Количество должно быть больше или равно 0!'
-                )
-        tags_data = request.data['tags']
-        validated_data.pop('recipe_ingredients')
+        ingredient_amounts = validated_data.pop('ingredient_amounts')
+        tag_ids = validated_data.pop('tag_ids')
         recipe = Recipe.objects.create(**validated_data)
-        self.add_recipe_ingredients(recipe, ingredients_data)
-        self.add_recipe_tags(recipe, tags_data)
+        self.add_recipe_ingredients(recipe, ingredient_amounts)
+        self.add_recipe_tags(recipe, tag_ids)
+        recipe_search.update([recipe.id])
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        request = self.context.get('request')
-        ingredients_data = request.data['ingredients']
-        for ingredient in ingredients_data:
-            if int(ingredient['amount']) < 0:
-                raise serializers.ValidationError(
-                    'Количество должно быть больше или равно 0!'
-                )
-        tags_data = request.data['tags']
+        ingredient_amounts = validated_data.pop('ingredient_amounts', None)
+        tag_ids = validated_data.pop('tag_ids', None)
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get('cooking_time',
                                                    instance.cooking_time)
         instance.image = validated_data.get('image', instance.image)
-        instance.save()
-        instance.recipe_ingredients.all().delete()
-        instance.recipe_tags.all().delete()
-        self.add_recipe_ingredients(instance, ingredients_data)
-        self.add_recipe_tags(instance, tags_data)
+        instance.version = F('version') + 1
+        instance.save(update_fields=['name', 'text', 'cooking_time', 'image',
+                                     'version'])
+        instance.refresh_from_db(fields=['version'])
+        with manual_recipe_sync():
+            if ingredient_amounts is not None:
+                ShoppingListItem.objects.apply_recipe_changes(
+                    instance,
+                    self.update_recipe_ingredients(instance,
+                                                   ingredient_amounts)
+                )
+            if tag_ids is not None:
+                self.update_recipe_tags(instance, tag_ids)
+        recipe_search.update([instance.id])
         return instance
 
     class Meta:
@@ -143,6 +296,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time',
             'image',
+            'image_variants',
             'ingredients',
             'tags',
             'is_favorited',
@@ -150,28 +304,3 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
         model = Recipe
         depth = 1
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ('id', 'user', 'recipe')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=['user', 'recipe'],
-                message='Вы уже добавили рецепт в избранное!'
-            )
-        ]
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ShoppingCart
-        fields = ('id', 'user', 'recipe')
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=['user', 'recipe'],
-                message='Вы уже добавили рецепт в список покупок!')
-        ]
@@ -0,0 +1,227 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from users.models import Follow
+
+from .cache import ingredients_cache, tags_cache
+from .images import schedule_variants
+from .models import (Favorite, FeedEntry, Ingredient, Recipe,
+                     RecipeIngredient, RecipeTag, ShoppingCart,
+                     ShoppingListItem, Tag)
+from .search import recipe_search
+
+User = get_user_model()
+
+COUNTERS = {
+    Favorite: 'favorited_count',
+    ShoppingCart: 'in_cart_count',
+}
+
+recipe_rows_synced = ContextVar('recipe_rows_synced', default=False)
+
+
+@contextmanager
+def manual_recipe_sync():
+    """Отключает обработчики строк рецепта: вызывающий обновляет зависимые
+    данные сам, одним пакетом."""
+    token = recipe_rows_synced.set(True)
+    try:
+        yield
+    finally:
+        recipe_rows_synced.reset(token)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipes(instance.user_id,
+                                             [instance.recipe_id])
+
+
+# После удаления: при каскадном удалении рецепта строки состава и корзины
+# удаляются в любом порядке, и каждая часть состава вычитается один раз.
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    ShoppingListItem.objects.remove_recipes(instance.user_id,
+                                            [instance.recipe_id])
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+@receiver(pre_save, sender=RecipeTag)
+def remember_recipe_row(sender, instance, raw, **kwargs):
+    if raw or recipe_rows_synced.get() or instance.pk is None:
+        return
+    instance._previous_row = sender.objects.filter(
+        id=instance.pk
+    ).values().first()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_shopping_lists(sender, instance, raw, **kwargs):
+    if raw or recipe_rows_synced.get():
+        return
+    changes = defaultdict(lambda: defaultdict(int))
+    previous = getattr(instance, '_previous_row', None)
+    if previous:
+        changes[previous['recipe_id']][previous['ingredient_id']] -= (
+            previous['amount']
+        )
+    changes[instance.recipe_id][instance.ingredient_id] += instance.amount
+    for recipe_id, deltas in changes.items():
+        ShoppingListItem.objects.apply_recipe_changes(recipe_id, deltas)
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    if not recipe_rows_synced.get():
+        ShoppingListItem.objects.apply_recipe_changes(
+            instance.recipe_id, {instance.ingredient_id: -instance.amount}
+        )
+
+
+def saved_row_recipe_ids(instance):
+    """Рецепт строки и рецепт, к которому она относилась до сохранения."""
+    previous = getattr(instance, '_previous_row', None)
+    return {instance.recipe_id, *([previous['recipe_id']] if previous else [])}
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def reindex_saved_row_recipes(sender, instance, raw, **kwargs):
+    if not raw and not recipe_rows_synced.get():
+        recipe_search.update(saved_row_recipe_ids(instance))
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def reindex_deleted_row_recipe(sender, instance, **kwargs):
+    if not recipe_rows_synced.get():
+        recipe_search.update([instance.recipe_id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+def bump_saved_row_recipes(sender, instance, raw, **kwargs):
+    if not raw and not recipe_rows_synced.get():
+        Recipe.objects.filter(
+            id__in=saved_row_recipe_ids(instance)
+        ).bump_version()
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeTag)
+def bump_deleted_row_recipe(sender, instance, **kwargs):
+    if not recipe_rows_synced.get():
+        Recipe.objects.filter(id=instance.recipe_id).bump_version()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(id=instance.recipe_id).increment(
+            COUNTERS[sender]
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    Recipe.objects.filter(id=instance.recipe_id).increment(
+        COUNTERS[sender], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).increment(
+            'recipes_count'
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_to_feed(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).increment(
+            'followers_count'
+        )
+        FeedEntry.objects.add_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def remove_from_feed(sender, instance, **kwargs):
+    User.objects.filter(id=instance.author_id).increment(
+        'followers_count', -1
+    )
+    FeedEntry.objects.remove_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=Recipe)
+def prepare_image_variants(sender, instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(id=instance.author_id).increment(
+        'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    ingredients_cache.bump()
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        recipe_search.update(RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            recipe_ingredients__ingredient=instance
+        ).bump_version()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_tag_recipes(sender, instance, created=False, **kwargs):
+    if not created:
+        Recipe.objects.filter(recipe_tags__tag=instance).bump_version()
+
+
+@receiver(post_save, sender=User)
+def bump_author_recipes(sender, instance, created, update_fields,
+                        **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    Recipe.objects.filter(author_id=instance.id).bump_version()
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search(sender, instance, **kwargs):
+    recipe_search.delete([instance.id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    tags_cache.bump()
@@ -0,0 +1,292 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import Follow
+
+from .management.fixtures import (create_ingredients, create_recipes,
+                                  create_tags, create_users)
+from .management.render_cases import (create_render_data, get_cases,
+                                      get_content)
+from .models import (Ingredient, RecipeIngredient, RecipeTag, ShoppingCart,
+                     ShoppingListItem)
+from .search import recipe_search
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов не зависит от размера страницы и состава рецепта."""
+
+    LIST_QUERIES = 9
+    DETAIL_QUERIES = 7
+    EDIT_QUERIES = 28
+    SUBSCRIPTIONS_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = create_users(40)
+        cls.tags = create_tags(5)
+        cls.ingredients = create_ingredients(41)
+        cls.small, = create_recipes(1, cls.authors, cls.tags, cls.ingredients,
+                                    ingredients_per_recipe=1,
+                                    tags_per_recipe=1)
+        create_recipes(40, cls.authors, cls.tags, cls.ingredients)
+        cls.large, = create_recipes(1, cls.authors, cls.tags, cls.ingredients,
+                                    ingredients_per_recipe=40,
+                                    tags_per_recipe=5)
+        Follow.objects.bulk_create(
+            Follow(user=cls.authors[0], author=author)
+            for author in cls.authors[1:]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.authors[0], recipe=recipe)
+            for recipe in (cls.small, cls.large)
+        )
+
+    def setUp(self):
+        # Считаем запросы без готового JSON рецептов в кэше.
+        cache.clear()
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def edit_payload(self, recipe):
+        amounts = {
+            item.ingredient_id: item.amount + 1
+            for item in recipe.recipe_ingredients.all()
+        }
+        extra = next(
+            ingredient for ingredient in self.ingredients
+            if ingredient.id not in amounts
+        )
+        amounts[extra.id] = 1
+        return {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in amounts.items()
+            ],
+            'tags': [tag.id for tag in self.tags[:2]],
+        }
+
+    def test_list(self):
+        client = self.get_client(self.authors[0])
+        for size in (1, 40):
+            cache.clear()
+            with self.subTest(limit=size):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = client.get(f'/api/recipes/?limit={size}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), size)
+
+    def test_detail(self):
+        client = self.get_client(self.authors[0])
+        for recipe in (self.small, self.large):
+            cache.clear()
+            with self.subTest(ingredients=recipe.recipe_ingredients.count()):
+                with self.assertNumQueries(self.DETAIL_QUERIES):
+                    response = client.get(f'/api/recipes/{recipe.id}/')
+                self.assertEqual(response.status_code, 200)
+
+    def test_edit(self):
+        for recipe in (self.small, self.large):
+            cache.clear()
+            client = self.get_client(recipe.author)
+            payload = self.edit_payload(recipe)
+            with self.subTest(ingredients=len(payload['ingredients'])):
+                with self.assertNumQueries(self.EDIT_QUERIES):
+                    response = client.patch(f'/api/recipes/{recipe.id}/',
+                                            payload, format='json')
+                self.assertEqual(response.status_code, 200)
+
+    def test_subscriptions(self):
+        client = self.get_client(self.authors[0])
+        for size in (1, 39):
+            cache.clear()
+            with self.subTest(limit=size):
+                with self.assertNumQueries(self.SUBSCRIPTIONS_QUERIES):
+                    response = client.get(
+                        f'/api/users/subscriptions/'
+                        f'?limit={size}&recipes_limit=3'
+                    )
+                self.assertEqual(response.status_code, 200)
+
+
+class ShoppingListTests(TestCase):
+    """Сохраненный список покупок совпадает с суммой рецептов в корзине."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_users(3)
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(10)
+        cls.recipes = create_recipes(4, cls.users, cls.tags, cls.ingredients,
+                                     ingredients_per_recipe=3)
+        for user in cls.users:
+            for recipe in cls.recipes[:3]:
+                ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def assertTotalsMatch(self):
+        self.assertEqual(ShoppingListItem.objects.stored_totals(),
+                         ShoppingListItem.objects.expected_totals())
+
+    def test_cart(self):
+        self.assertTotalsMatch()
+        ShoppingCart.objects.filter(user=self.users[0]).first().delete()
+        self.assertTotalsMatch()
+
+    def test_edit_recipe(self):
+        recipe = self.recipes[0]
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        response = client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 7}
+                for ingredient in self.ingredients[:2]
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTotalsMatch()
+
+    def test_edit_recipe_ingredient(self):
+        row = RecipeIngredient.objects.filter(recipe=self.recipes[0]).first()
+        row.amount += 5
+        row.save()
+        self.assertTotalsMatch()
+        row.recipe = self.recipes[1]
+        row.save()
+        self.assertTotalsMatch()
+        RecipeIngredient.objects.create(recipe=self.recipes[2],
+                                        ingredient=self.ingredients[-1],
+                                        amount=3)
+        self.assertTotalsMatch()
+        row.delete()
+        self.assertTotalsMatch()
+
+    def test_delete_recipe(self):
+        self.recipes[0].delete()
+        self.assertTotalsMatch()
+        self.ingredients[0].delete()
+        self.assertTotalsMatch()
+
+
+class IngredientSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('сахар', 'сахарная пудра', 'соль', 'сода')
+        )
+
+    def search(self, **params):
+        response = APIClient().get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_limit_is_clamped(self):
+        for limit in ('0', '-3'):
+            with self.subTest(limit=limit):
+                self.assertEqual(len(self.search(name='с', limit=limit)), 1)
+
+    def test_short_query_typo(self):
+        self.assertEqual(self.search(name='сахр', fuzzy=1), ['сахар'])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_lookups_use_indexes(self):
+        if connection.vendor == 'postgresql':
+            # На маленьких таблицах PostgreSQL и без того читает их
+            # целиком, поэтому Seq Scan и Sort остаются в плане, только
+            # если подходящего индекса нет.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+        call_command('check_query_plans', recipes=200, users=50,
+                     stdout=StringIO())
+
+
+class FastRenderTests(TestCase):
+    """Быстрые пути выдачи отдают тот же JSON байт в байт, что и
+    сериализаторы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, cls.recipes = create_render_data(
+            30, ingredients=100, users=20
+        )
+
+    def test_same_content(self):
+        clients = {'anonymous': APIClient(), 'viewer': APIClient()}
+        clients['viewer'].force_authenticate(self.viewer)
+        cases = get_cases(self.viewer, self.recipes[0].id, len(self.recipes))
+        for name, url, public in cases:
+            for client_name, client in clients.items():
+                if not public and client_name == 'anonymous':
+                    continue
+                with self.subTest(name, client=client_name):
+                    expected = get_content(client, url, fast=False)
+                    self.assertEqual(get_content(client, url, fast=True),
+                                     expected)
+                    self.assertEqual(
+                        get_content(client, url, fast=True, cold=False),
+                        expected
+                    )
+
+
+class RecipeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe, = create_recipes(1, create_users(1), create_tags(1),
+                                     create_ingredients(1))
+        recipe_search.update([cls.recipe.id])
+        cls.ingredient = Ingredient.objects.create(name='кардамон',
+                                                   measurement_unit='г')
+
+    def found(self):
+        response = APIClient().get('/api/recipes/', {'search': 'кардамон'})
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_recipe_ingredient_rows(self):
+        self.assertEqual(self.found(), [])
+        row = RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1
+        )
+        self.assertEqual(self.found(), [self.recipe.id])
+        row.delete()
+        self.assertEqual(self.found(), [])
+
+
+class RecipeVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(2)
+        cls.ingredients = create_ingredients(2)
+        cls.recipe, cls.other = create_recipes(
+            2, create_users(1), cls.tags[:1], cls.ingredients[:1],
+            ingredients_per_recipe=1, tags_per_recipe=1
+        )
+
+    def assertBumped(self, *recipes):
+        for recipe in recipes:
+            version = recipe.version
+            recipe.refresh_from_db(fields=['version'])
+            self.assertGreater(recipe.version, version)
+
+    def test_recipe_rows(self):
+        rows = (
+            (RecipeIngredient, {'ingredient': self.ingredients[1],
+                                'amount': 1}),
+            (RecipeTag, {'tag': self.tags[1]}),
+        )
+        for model, fields in rows:
+            with self.subTest(model.__name__):
+                row = model.objects.create(recipe=self.recipe, **fields)
+                self.assertBumped(self.recipe)
+                row.recipe = self.other
+                row.save()
+                self.assertBumped(self.recipe, self.other)
+                row.delete()
+                self.assertBumped(self.other)
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register('ingredients',
@@ -11,5 +11,9 @@ router.register('tags', views.TagViewSet, basename='tags')
 router.register('recipes', views.RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('recipes/<int:pk>/favorite/', async_views.favorite,
+         name='recipes-favorite'),
+    path('recipes/<int:pk>/shopping_cart/', async_views.shopping_cart,
+         name='recipes-shopping-cart'),
     path('', include(router.urls)),
 ]
@@ -1,27 +1,119 @@
-from io import BytesIO
+import csv
+import json
+from functools import lru_cache
+from tempfile import SpooledTemporaryFile
 
 from django.conf import settings
+from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+FONT_NAME = 'DejaVuSerifCondensed'
+FONT_SIZE = 16
+PAGE_TOP = 800
+PAGE_BOTTOM = 50
+LINE_HEIGHT = 40
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    pdfmetrics.registerFont(TTFont(FONT_NAME, settings.FONT_PATH))
+    return FONT_NAME
+
 
 def pdf_create(products):
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer)
-    pdfmetrics.registerFont(TTFont('DejaVuSerifCondensed', settings.FONT_PATH))
-    p.setFont('DejaVuSerifCondensed', 16)
-    p.drawString(200, 800, "Продуктовый помощник")
-    p.drawString(180, 700, "Список продуктов для покупки")
-    coord_y = 600
+    """Рисует список продуктов, перенося строки на новые страницы.
+
+    Документ пишется во временный файл, который держится в памяти только
+    до SPOOL_MAX_SIZE, и возвращается открытым с начала для отдачи
+    ответом по частям.
+    """
+    font = register_font()
+    pdf = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    p = canvas.Canvas(pdf, pagesize=A4, pageCompression=1)
+    p.setFont(font, FONT_SIZE)
+    p.drawString(200, PAGE_TOP, 'Продуктовый помощник')
+    p.drawString(180, PAGE_TOP - 100, 'Список продуктов для покупки')
+    coord_y = PAGE_TOP - 200
     for product in products:
+        if coord_y < PAGE_BOTTOM:
+            p.showPage()
+            p.setFont(font, FONT_SIZE)
+            coord_y = PAGE_TOP
         name = product['name']
         amount = product['amount']
         measurement_unit = product['measurement_unit']
         p.drawString(50, coord_y, f'{name} - {amount} {measurement_unit}')
-        coord_y -= 40
+        coord_y -= LINE_HEIGHT
     p.showPage()
     p.save()
-    pdf = buffer.getvalue()
-    buffer.close()
+    pdf.seek(0)
     return pdf
+
+
+class EchoBuffer:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def txt_lines(products):
+    yield 'Список продуктов для покупки\n\n'
+    for product in products:
+        yield (f'{product["name"]} - {product["amount"]} '
+               f'{product["measurement_unit"]}\n')
+
+
+def csv_lines(products):
+    writer = csv.writer(EchoBuffer())
+    # BOM нужен, чтобы Excel открыл файл в UTF-8.
+    yield '\ufeff' + writer.writerow(
+        ('Ингредиент', 'Количество', 'Единица измерения')
+    )
+    for product in products:
+        yield writer.writerow((product['name'], product['amount'],
+                               product['measurement_unit']))
+
+
+def json_chunks(products):
+    separator = '['
+    for product in products:
+        yield separator + json.dumps({
+            'name': product['name'],
+            'amount': product['amount'],
+            'measurement_unit': product['measurement_unit'],
+        }, ensure_ascii=False, separators=(',', ':'))
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def spool(chunks):
+    """Пишет части текста во временный файл и возвращает его с начала.
+
+    Как и PDF, файл держится в памяти только до SPOOL_MAX_SIZE. Строки
+    читаются из базы здесь, в потоке представления: под ASGI Django 3.2
+    перебирает потоковый ответ в цикле событий, где запросы к базе
+    запрещены.
+    """
+    file = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    for chunk in chunks:
+        file.write(chunk.encode())
+    file.seek(0)
+    return file
+
+
+def text_export(lines):
+    def create(products):
+        return spool(lines(products))
+    return create
+
+
+EXPORT_FORMATS = {
+    'pdf': (pdf_create, 'application/pdf'),
+    'txt': (text_export(txt_lines), 'text/plain; charset=utf-8'),
+    'csv': (text_export(csv_lines), 'text/csv; charset=utf-8'),
+    'json': (text_export(json_chunks), 'application/json'),
+}
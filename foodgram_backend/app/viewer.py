@@ -0,0 +1,46 @@
+from django.utils.functional import cached_property
+
+from users.models import Follow
+
+from .models import Favorite, ShoppingCart
+
+
+class ViewerContext:
+    """Связи текущего пользователя с рецептами и авторами.
+
+    Каждое множество id загружается одним запросом при первом обращении
+    и переиспользуется до конца запроса. Для анонимного пользователя
+    запросы не выполняются.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def load_ids(self, queryset, field):
+        if self.user is None or not self.user.is_authenticated:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def favorited_ids(self):
+        return self.load_ids(Favorite.objects.order_by(), 'recipe_id')
+
+    @cached_property
+    def cart_ids(self):
+        return self.load_ids(ShoppingCart.objects.order_by(), 'recipe_id')
+
+    @cached_property
+    def followed_ids(self):
+        return self.load_ids(Follow.objects.order_by(), 'author_id')
+
+
+def get_viewer_context(request):
+    if request is None:
+        return ViewerContext(None)
+    viewer = getattr(request, 'viewer_context', None)
+    if viewer is None:
+        viewer = ViewerContext(request.user)
+        request.viewer_context = viewer
+    return viewer
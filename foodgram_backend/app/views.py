@@ -1,133 +1,137 @@
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from rest_framework import status, viewsets
+from django.conf import settings
+from django.db.models import F
+from django.http import FileResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from . import filters
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .batch import batch_response, favorite_batch, shopping_cart_batch
+from .autocomplete import ingredient_index
+from .cache import CachedReferenceMixin, ingredients_cache, tags_cache
+from .pagination import KeysetPagination
+from .models import FeedEntry, Ingredient, Recipe, Tag
+from .negotiation import FirstRendererNegotiation
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer)
-from .utils import pdf_create
+from .recipe_cache import CachedRecipeMixin, RecipeJsonCache
+from .serializers import (IngredientSerializer, RecipeSerializer,
+                          ShoppingListItemSerializer, TagSerializer)
+from .utils import EXPORT_FORMATS
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filterset_class = filters.IngredientFilter
     pagination_class = None
+    reference_cache = ingredients_cache
+    fast_render = True
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            if self.fast_render:
+                return self.cached_response(self.list_rows, request)
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = max(1, min(int(request.query_params['limit']),
+                               settings.INGREDIENT_SEARCH_MAX_LIMIT))
+        except (KeyError, ValueError):
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        fuzzy = request.query_params.get('fuzzy') in ('1', 'true')
+        return Response(ingredient_index.search(name, limit, fuzzy))
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    def list_rows(self, request):
+        return Response(list(self.filter_queryset(self.get_queryset()).values(
+            'id', 'name', 'measurement_unit'
+        )))
+
+
+class TagViewSet(CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    reference_cache = tags_cache
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedRecipeMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-pub_date', 'id')
     permission_classes = [AllowAny, IsAuthorOrReadOnly]
     filterset_class = filters.RecipeFilter
+    filter_backends = [DjangoFilterBackend, filters.RecipeSearchFilter]
 
     def get_queryset(self):
-        return Recipe.objects.annotate_favorited_flag(
-            self.request.user
-        ).annotate_in_shopping_cart_flag(
-            self.request.user
-        )
+        return Recipe.objects.prefetch_recipe_data()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        self.reload_instance(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload_instance(serializer)
+
+    def reload_instance(self, serializer):
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
     @action(['get'], detail=False, permission_classes=[IsAuthenticated])
+    def shopping_list(self, request):
+        items = request.user.shopping_list.select_related('ingredient')
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data)
+
+    @action(['get'], detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        FeedEntry.objects.pull_hot_authors(request.user.id)
+        page = self.paginate_queryset(request.user.feed.all())
+        recipe_ids = [entry.recipe_id for entry in page]
+        if self.uses_recipe_cache(request):
+            recipes = Recipe.objects.only(*RecipeJsonCache.fields)
+        else:
+            recipes = Recipe.objects.prefetch_recipe_data()
+        recipes = recipes.in_bulk(recipe_ids)
+        recipes = [recipes[recipe_id] for recipe_id in recipe_ids
+                   if recipe_id in recipes]
+        if self.uses_recipe_cache(request):
+            return self.recipe_page_response(recipes)
+        serializer = self.get_serializer(recipes, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(['post'], detail=False, url_path='favorite',
+            url_name='favorite-batch', permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        return batch_response(request, favorite_batch)
+
+    @action(['post'], detail=False, url_path='shopping_cart',
+            url_name='shopping-cart-batch',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        return batch_response(request, shopping_cart_batch)
+
+    @action(['get'], detail=False, permission_classes=[IsAuthenticated],
+            content_negotiation_class=FirstRendererNegotiation)
     def download_shopping_cart(self, request):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.pdf"'
-        )
-        products = []
-        cart_recipes = request.user.shopping_cart.values_list('recipe')
-        recipes = RecipeIngredient.objects.filter(
-            recipe_id__in=(cart_recipes)
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount_sum=Sum('amount'))
-        for recipe in recipes:
-            product = {}
-            product['name'] = recipe['ingredient__name']
-            product['measurement_unit'] = (
-                recipe['ingredient__measurement_unit']
-            )
-            product['amount'] = recipe['amount_sum']
-            products.append(product)
-        pdf = pdf_create(products)
-        response.write(pdf)
-        return response
-
-    @action(
-        ['get', 'delete'],
-        detail=True,
-        permission_classes=[IsAuthenticated]
-    )
-    def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if request.method == 'GET':
-            serializer = FavoriteSerializer(
-                data={'recipe': recipe.id, 'user': request.user.id}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                recipe_serializer = RecipeSerializer(
-                    recipe,
-                    context={'request': request}
-                )
-                return Response(recipe_serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(serializer.errors,
-                            status=status.HTTP_400_BAD_REQUEST)
-        if request.method == 'DELETE':
-            if Favorite.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).delete() != 0:
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({'errors': 'Рецепт уже удален из избранного!'},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-    @action(
-        ['get', 'delete'],
-        detail=True,
-        permission_classes=[IsAuthenticated]
-    )
-    def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if request.method == 'GET':
-            serializer = ShoppingCartSerializer(
-                data={'recipe': recipe.id, 'user': request.user.id}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                recipe_serializer = RecipeSerializer(
-                    recipe,
-                    context={'request': request}
-                )
-                return Response(recipe_serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(serializer.errors,
-                            status=status.HTTP_400_BAD_REQUEST)
-        if request.method == 'DELETE':
-            if ShoppingCart.objects.filter(
-                user=request.user,
-                recipe=recipe
-            ).delete() != 0:
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({'errors': 'Рецепт уже удален из корзины!'},
-                            status=status.HTTP_400_BAD_REQUEST)
+        export_format = request.query_params.get('format', 'pdf')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'format': [
+                'Доступные форматы: ' + ', '.join(EXPORT_FORMATS) + '.'
+            ]})
+        create, content_type = EXPORT_FORMATS[export_format]
+        products = request.user.shopping_list.values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).iterator(chunk_size=settings.SHOPPING_LIST_EXPORT_CHUNK_SIZE)
+        return FileResponse(create(products),
+                            as_attachment=True,
+                            filename=f'shopping_cart.{export_format}',
+                            content_type=content_type)
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('foodgram.requests')
+
+current_queries = ContextVar('current_queries', default=None)
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+SQL_PREVIEW_LENGTH = 300
+
+
+def find_origin():
+    """Ближайший к запросу кадр стека из кода проекта."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(PROJECT_DIR)
+                and 'site-packages' not in filename
+                and filename != __file__):
+            return (f'{frame.f_code.co_name} '
+                    f'({os.path.relpath(filename, PROJECT_DIR)}:'
+                    f'{frame.f_lineno})')
+        frame = frame.f_back
+    return None
+
+
+class QueryStats:
+    """Счётчик SQL-запросов для connection.execute_wrapper.
+
+    Запросы группируются по тексту без параметров, поэтому N+1
+    выглядит как одна строка с большим счётчиком. Место вызова
+    ищется только для первого запроса каждой группы.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            statement = self.statements.get(sql)
+            if statement is None:
+                statement = self.statements[sql] = [0, 0.0, find_origin()]
+            statement[0] += 1
+            statement[1] += duration
+
+    def top(self, limit):
+        statements = sorted(self.statements.items(),
+                            key=lambda item: item[1][1], reverse=True)
+        return [
+            {
+                'sql': sql[:SQL_PREVIEW_LENGTH],
+                'count': count,
+                'duration_ms': round(duration * 1000, 2),
+                'origin': origin,
+            }
+            for sql, (count, duration, origin) in statements[:limit]
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    queries = current_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Подключает счётчик к соединению любого потока.
+
+    Запросы асинхронных представлений выполняются в потоках
+    sync_to_async, поэтому текущий счётчик берётся из contextvar,
+    а не из соединения потока, принявшего запрос.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'started', 'view_started', 'view_sql',
+                 'serialize', 'render_started', 'render')
+
+    def __init__(self):
+        self.queries = QueryStats()
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_sql = 0.0
+        self.serialize = None
+        self.render_started = None
+        self.render = 0.0
+
+    def view_finished(self):
+        """Время кода представления и сериализаторов без учёта SQL."""
+        if self.view_started is not None and self.serialize is None:
+            self.serialize = (time.perf_counter() - self.view_started
+                              - self.queries.duration + self.view_sql)
+
+    def render_finished(self, response):
+        self.render = time.perf_counter() - self.render_started
+
+
+class RequestMetricsMiddleware:
+    """Число и время SQL-запросов, время сериализации и рендеринга.
+
+    Метрики отдаются в заголовке Server-Timing и пишутся строкой JSON
+    в лог foodgram.requests. Для запросов дольше
+    REQUEST_METRICS_SLOW_MS в лог попадают самые долгие SQL-запросы
+    с местом вызова.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow = settings.REQUEST_METRICS_SLOW_MS / 1000
+        self.top_queries = settings.REQUEST_METRICS_TOP_QUERIES
+        if asyncio.iscoroutinefunction(get_response):
+            # Асинхронные хуки не требуют перехода в поток синхронного кода.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all():
+            install_query_recorder(self, connection)
+        metrics = request.metrics = RequestMetrics()
+        token = current_queries.set(metrics.queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = request.metrics = RequestMetrics()
+        token = current_queries.set(metrics.queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_queries.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        metrics.view_finished()
+        total = time.perf_counter() - metrics.started
+        response['Server-Timing'] = self.server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics.view_started = time.perf_counter()
+        request.metrics.view_sql = request.metrics.queries.duration
+
+    async def aprocess_view(self, request, *args):
+        self.process_view(request, *args)
+
+    def process_template_response(self, request, response):
+        metrics = request.metrics
+        metrics.view_finished()
+        metrics.render_started = time.perf_counter()
+        response.add_post_render_callback(metrics.render_finished)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        return self.process_template_response(request, response)
+
+    @staticmethod
+    def server_timing(metrics, total):
+        return ', '.join((
+            f'db;dur={metrics.queries.duration * 1000:.1f};'
+            f'desc="{metrics.queries.count} SQL"',
+            f'serialize;dur={(metrics.serialize or 0) * 1000:.1f}',
+            f'render;dur={metrics.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+    def log(self, request, response, metrics, total):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'user': getattr(getattr(request, 'user', None), 'pk', None),
+            'queries': metrics.queries.count,
+            'db_ms': round(metrics.queries.duration * 1000, 2),
+            'serialize_ms': round((metrics.serialize or 0) * 1000, 2),
+            'render_ms': round(metrics.render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+        if total < self.slow:
+            logger.info(json.dumps(record, ensure_ascii=False))
+            return
+        record['top_queries'] = metrics.queries.top(self.top_queries)
+        logger.warning(json.dumps(record, ensure_ascii=False))
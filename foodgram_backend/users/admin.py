@@ -4,7 +4,8 @@ from .models import CustomUser, Follow
 
 
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ('email', 'username', 'first_name', 'last_name', 'role')
+    list_display = ('email', 'username', 'first_name', 'last_name', 'role',
+                    'recipes_count')
     search_fields = ('email', 'username')
 
 
@@ -0,0 +1,45 @@
+from app.async_utils import authenticate, render, toggle_view
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from .models import Follow
+from .serializers import SubscribedUserSerializer
+from .views import attach_recipe_previews
+
+User = get_user_model()
+
+
+@toggle_view
+def subscribe(request, pk):
+    user = authenticate(request)
+    author = User.objects.filter(id=pk).first()
+    if author is None:
+        raise NotFound
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            User.objects.filter(id=user.id).lock()
+            deleted, _ = Follow.objects.filter(
+                user=user, author=author
+            ).delete()
+        if not deleted:
+            return render({'errors': 'Вы уже отписаны от этого автора!'},
+                          status.HTTP_400_BAD_REQUEST)
+        return render(status_code=status.HTTP_204_NO_CONTENT)
+    if author == user:
+        return render({'error': ['Нельзя подписаться на самого себя!']},
+                      status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        User.objects.filter(id=user.id).lock()
+        _, created = Follow.objects.get_or_create(user=user, author=author)
+    if not created:
+        return render({'error': ['Вы уже подписаны на этого автора!']},
+                      status.HTTP_400_BAD_REQUEST)
+    return render(
+        SubscribedUserSerializer(
+            attach_recipe_previews([author], request)[0],
+            context={'request': request}
+        ).data,
+        status.HTTP_201_CREATED
+    )
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+INVALIDATED = 'invalidated'
+# Пароль и счетчики в кэш не попадают: у пользователя из кэша они
+# отложены и при обращении читаются из БД.
+CACHED_USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name',
+                      'role', 'is_active', 'is_staff', 'is_superuser')
+
+User = get_user_model()
+
+
+class TokenCache:
+    """Поля пользователя (CACHED_USER_FIELDS) по ключам токенов.
+
+    Первый уровень — LRU в памяти процесса с коротким сроком жизни,
+    второй — кэш Django, общий для всех процессов. При сбросе ключ
+    в общем кэше ненадолго помечается недействительным, чтобы
+    параллельный запрос не вернул туда устаревшего пользователя.
+    Остальные процессы перестают использовать свою копию не позже,
+    чем через local_ttl секунд.
+    """
+
+    schema = 2
+
+    def __init__(self, max_entries, ttl, local_ttl, invalidated_ttl=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.invalidated_ttl = invalidated_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def cache_key(self, key):
+        return f'auth_token:{self.schema}:{key}'
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+            self._entries.pop(key, None)
+        result = cache.get(self.cache_key(key))
+        if result is None or result == INVALIDATED:
+            return None
+        self.remember(key, result, now)
+        return result
+
+    def set(self, key, result):
+        if cache.add(self.cache_key(key), result, self.ttl):
+            self.remember(key, result, time.monotonic())
+
+    def delete(self, key):
+        cache.set(self.cache_key(key), INVALIDATED, self.invalidated_ttl)
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def remember(self, key, result, now):
+        if not self.local_ttl:
+            return
+        with self._lock:
+            self._entries[key] = (result, now + self.local_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для известных токенов.
+
+    Для известного токена request.user собирается из полей в кэше,
+    остальные поля отложены. Сохранение такого пользователя пишет только
+    загруженные поля, а отложенные читаются из БД при обращении.
+    """
+
+    def authenticate_credentials(self, key):
+        values = token_cache.get(key)
+        if values is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, tuple(
+                getattr(user, field) for field in CACHED_USER_FIELDS
+            ))
+            return user, token
+        user = User.from_db(DEFAULT_DB_ALIAS, CACHED_USER_FIELDS, values)
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        token = self.get_model().from_db(
+            DEFAULT_DB_ALIAS, ('key', 'user_id'), (key, user.id)
+        )
+        token.user = user
+        return user, token
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_MAX_ENTRIES,
+                         settings.TOKEN_CACHE_TTL,
+                         settings.TOKEN_CACHE_LOCAL_TTL)
@@ -0,0 +1,34 @@
+from app.batch import RelationBatch
+from app.models import FeedEntry
+from django.contrib.auth import get_user_model
+
+from .models import Follow
+
+User = get_user_model()
+
+
+class FollowBatch(RelationBatch):
+    model = Follow
+    field = 'author'
+    target_model = User
+    not_found_error = 'Автор не найден!'
+    exists_error = 'Вы уже подписаны на этого автора!'
+    missing_error = 'Вы уже отписаны от этого автора!'
+
+    def get_error(self, user, action, target_id, found, current):
+        if action == 'add' and target_id == user.id:
+            return 'Нельзя подписаться на самого себя!'
+        return super().get_error(user, action, target_id, found, current)
+
+    def added(self, user, author_ids):
+        User.objects.filter(id__in=author_ids).increment('followers_count')
+        FeedEntry.objects.add_authors(user.id, author_ids)
+
+    def removed(self, user, author_ids):
+        User.objects.filter(id__in=author_ids).increment(
+            'followers_count', -1
+        )
+        FeedEntry.objects.remove_authors(user.id, author_ids)
+
+
+follow_batch = FollowBatch()
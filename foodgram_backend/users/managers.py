@@ -1,23 +1,48 @@
 from django.contrib.auth.models import BaseUserManager
-from django.db.models import Count, OuterRef
-from django.db.models.expressions import Exists
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.db.models.query import QuerySet
 
 
-class UserQueryset(QuerySet):
-    def annotate_subscribed_flag(self, user):
-        from users.models import Follow
-        return self.annotate(
-            is_subscribed=Exists(Follow.objects.filter(
-                author=OuterRef('pk'),
-                user=user if user.is_authenticated else None)
-            )
-        )
+def related_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
 
-    def annotate_recipes_count(self):
-        return self.annotate(
-            recipes_count=Count('recipes')
-        )
+
+class CounterQueryset(QuerySet):
+    def increment(self, field, delta=1):
+        queryset = self
+        if delta < 0:
+            queryset = self.filter(**{f'{field}__gte': -delta})
+        return queryset.update(**{field: F(field) + delta})
+
+    def reconcile(self, field, actual, batch_size=1000):
+        drifted = list(self.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', flat=True))
+        for start in range(0, len(drifted), batch_size):
+            self.model.objects.filter(
+                pk__in=drifted[start:start + batch_size]
+            ).update(**{field: actual})
+        return len(drifted)
+
+
+class UserQueryset(CounterQueryset):
+    def lock(self):
+        """Блокирует строки пользователей до конца транзакции.
+
+        Избранное, корзина, подписки и список покупок пользователя
+        меняются только под этой блокировкой.
+        """
+        list(self.select_for_update().order_by('id').values_list('id'))
 
 
 class CustomAccountManager(BaseUserManager.from_queryset(UserQueryset)):
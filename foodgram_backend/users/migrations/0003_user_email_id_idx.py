@@ -0,0 +1,17 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email', 'id'], name='user_email_id_idx'),
+        ),
+    ]
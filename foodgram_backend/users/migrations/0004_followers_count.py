@@ -0,0 +1,35 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:51
+
+from django.db import migrations, models
+import django.db.models.functions
+
+
+def fill_followers_count(apps, schema_editor):
+    User = apps.get_model('users', 'CustomUser')
+    Follow = apps.get_model('users', 'Follow')
+    User.objects.update(followers_count=django.db.models.functions.Coalesce(
+        models.Subquery(
+            Follow.objects.filter(
+                author=models.OuterRef('pk')
+            ).order_by().values('author').annotate(
+                total=models.Count('pk')
+            ).values('total')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_email_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
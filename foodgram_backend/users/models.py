@@ -4,7 +4,31 @@ from django.db import models
 from .managers import CustomAccountManager
 
 
-class CustomUser(AbstractUser):
+class ProtectedFieldsMixin:
+    """Не дает обычному save() записать поля из protected_fields.
+
+    Эти поля меняются только запросами UPDATE (счетчики — через
+    increment), поэтому сохранение уже существующей строки пишет все
+    остальные загруженные поля и не затирает параллельные изменения
+    значениями, прочитанными в начале запроса.
+    """
+
+    protected_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.protected_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(ProtectedFieldsMixin, AbstractUser):
     ADMIN = 'admin'
     USER = 'user'
     ROLES = [
@@ -25,11 +49,21 @@ class CustomUser(AbstractUser):
         choices=ROLES,
         default=USER,
     )
+    recipes_count = models.PositiveIntegerField('Количество рецептов',
+                                                default=0,
+                                                editable=False)
+    followers_count = models.PositiveIntegerField('Количество подписчиков',
+                                                  default=0,
+                                                  editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'password', 'first_name', 'last_name')
+    protected_fields = ('recipes_count', 'followers_count')
     objects = CustomAccountManager()
 
     class Meta:
+        indexes = [
+            models.Index(fields=['email', 'id'], name='user_email_id_idx'),
+        ]
         ordering = ['email']
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
@@ -0,0 +1,8 @@
+USER_FIELDS = ('id', 'first_name', 'last_name', 'username', 'email')
+
+
+def user_representation(row, viewer, prefix=''):
+    """То же, что выдает UserSerializer, из строки ``.values()``."""
+    data = {field: row[prefix + field] for field in USER_FIELDS}
+    data['is_subscribed'] = data['id'] in viewer.followed_ids
+    return data
@@ -1,14 +1,17 @@
+from app.viewer import get_viewer_context
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from .models import Follow
-
 User = get_user_model()
 
 
 class UserSerializer(serializers.ModelSerializer):
-    is_subscribed = serializers.BooleanField(read_only=True)
+    is_subscribed = serializers.SerializerMethodField()
+
+    def get_is_subscribed(self, obj):
+        viewer = get_viewer_context(self.context.get('request'))
+        return obj.id in viewer.followed_ids
 
     class Meta:
         fields = ('id', 'first_name', 'last_name',
@@ -25,30 +28,10 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
-class SubscriptionWriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        fields = ('id', 'author', 'user')
-        model = Follow
-
-    def validate(self, data):
-        if data.get('author') == data.get('user'):
-            raise ValidationError(
-                'Нельзя подписаться на самого себя!'
-            )
-        if Follow.objects.filter(
-            user=data.get('user'),
-            author=data.get('author')
-        ).exists():
-            raise ValidationError(
-                'Вы уже подписаны на этого автора!'
-            )
-        return data
-
-
 class SubscribedUserSerializer(serializers.ModelSerializer):
     from app.serializers import RecipeCommonSerializer
     recipes_count = serializers.IntegerField(read_only=True)
-    recipes = RecipeCommonSerializer(many=True)
+    recipes = RecipeCommonSerializer(source='recipe_previews', many=True)
 
     class Meta:
         fields = ('id', 'first_name', 'last_name',
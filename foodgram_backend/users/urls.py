@@ -1,13 +1,15 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register('users', views.UserViewSet, basename='users')
 
 
 urlpatterns = [
+    path('users/<int:pk>/subscribe/', async_views.subscribe,
+         name='users-subscribe'),
     path('', include(router.urls)),
     path('', include('djoser.urls.base')),
     path('auth/', include('djoser.urls.authtoken')),
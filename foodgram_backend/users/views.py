@@ -1,28 +1,58 @@
+from app.batch import batch_response
+from app.models import Recipe
+from app.pagination import KeysetPagination
+from app.viewer import get_viewer_context
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Follow
+from .batch import follow_batch
+from .representations import USER_FIELDS, user_representation
 from .serializers import (PasswordChangeSerializer, SubscribedUserSerializer,
-                          SubscriptionWriteSerializer, UserCreateSerializer,
-                          UserSerializer)
+                          UserCreateSerializer, UserSerializer)
 
 User = get_user_model()
 
 
+def attach_recipe_previews(authors, request):
+    try:
+        limit = int(request.GET['recipes_limit'])
+    except (KeyError, ValueError):
+        limit = None
+    if limit is not None and limit < 0:
+        limit = None
+    previews = {author.id: [] for author in authors}
+    if limit != 0 and previews:
+        for recipe in Recipe.objects.latest_by_authors(list(previews),
+                                                       limit):
+            previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipe_previews = previews[author.id]
+    return authors
+
+
 class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    cursor_ordering = ('email', 'id')
+    fast_render = True
 
     def get_queryset(self):
-        return User.objects.annotate_subscribed_flag(
-            self.request.user
-        ).annotate_recipes_count()
+        return User.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_render:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset()).values(*USER_FIELDS)
+        )
+        viewer = get_viewer_context(request)
+        return self.get_paginated_response(
+            [user_representation(row, viewer) for row in page]
+        )
 
     def create(self, request):
         creation_serializer = UserCreateSerializer(
@@ -51,58 +81,36 @@ class UserViewSet(viewsets.ModelViewSet):
             context={'request': request}
         )
         if serializer.is_valid():
-            self.request.user.set_password(serializer.data['new_password'])
-            self.request.user.save()
+            # request.user может быть собран из кэша токенов, поэтому
+            # пароль меняется у пользователя, прочитанного из БД.
+            user = User.objects.get(id=request.user.id)
+            user.set_password(serializer.data['new_password'])
+            user.save(update_fields=['password'])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    @action(['post'], detail=False, url_path='subscribe',
+            url_name='subscribe-batch', permission_classes=[IsAuthenticated])
+    def subscribe_batch(self, request):
+        return batch_response(request, follow_batch)
+
     @action(['get'], detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         queryset = User.objects.filter(following__user=request.user)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = SubscribedUserSerializer(
-                page,
+                attach_recipe_previews(page, request),
                 many=True,
                 context={'request': request}
             )
             return self.get_paginated_response(serializer.data)
         serializer = SubscribedUserSerializer(
-            queryset,
+            attach_recipe_previews(list(queryset), request),
             many=True,
             context={'request': request}
         )
         return Response(serializer.data)
-
-    @action(
-        ['get', 'delete'],
-        detail=True,
-        permission_classes=[IsAuthenticated]
-    )
-    def subscribe(self, request, pk):
-        author = get_object_or_404(User, id=pk)
-        if request.method == 'GET':
-            serializer = SubscriptionWriteSerializer(
-                data={'author': author.id, 'user': request.user.id}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                subscribed_serializer = SubscribedUserSerializer(
-                    author,
-                    context={'request': request}
-                )
-                return Response(subscribed_serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(serializer.errors,
-                            status=status.HTTP_400_BAD_REQUEST)
-        if request.method == 'DELETE':
-            if Follow.objects.filter(
-                    user=request.user,
-                    author=author
-            ).delete() != 0:
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({'errors': 'Вы уже отписаны от этого автора!'},
-                            status=status.HTTP_400_BAD_REQUEST)